@@ -3,30 +3,23 @@ from fastapi import FastAPI
 from pydantic import BaseModel
 from typing import List, Optional
 from common.mcp_core.server import app as base_app
-from common.mcp_core.tools import tool
-from rag_store import VectorStore
+from common.mcp_core.tools import lazy_tool, register_executor
 
 app = base_app
-store = VectorStore()
 
 class IndexIn(BaseModel):
     ids: List[str]
     texts: List[str]
 
-@tool("ingest")
-def ingest(ids: List[str], texts: List[str]):
-    store.add(ids, texts)
-    return {"ok": True, "count": len(ids)}
-
-@tool("search")
-def search(query: str, threshold: float = 0.4):
-    hits = store.query(query, n=3)
-    if hits and hits[0][1] < threshold:
-        return {"mode": "vector", "hits": hits}
-    # fallback to "web search" placeholder
-    return {"mode": "fallback", "hits": [{"title":"Fallback search result", "url":"https://example.com"}]}
+# chromadb + SentenceTransformer load on first call / background warm-up, not at import.
+lazy_tool("ingest", "rag_tools:ingest", init="rag_tools:get_store")
+# Bulk ingest embeds/writes in fixed-size batches on its own pool so searches stay responsive.
+register_executor("ingest", kind="thread", max_workers=1)
+lazy_tool("ingest_jsonl", "rag_tools:ingest_jsonl", init="rag_tools:get_store", executor="ingest", max_concurrency=1, max_queue=2)
+lazy_tool("ingest_jsonl_stream", "rag_tools:ingest_jsonl_stream", init="rag_tools:get_store", executor="ingest", max_concurrency=1, max_queue=2)
+lazy_tool("search", "rag_tools:search", init="rag_tools:get_store", cache={"ttl": 300, "max_entries": 2048}, coalesce=True)
 
 # Mount simple routes for convenience
 @app.get("/health")
 def health():
-    return {"status":"ok","tools":["ingest","search"]}
+    return {"status":"ok","tools":["ingest","ingest_jsonl","ingest_jsonl_stream","search"]}
@@ -0,0 +1,123 @@
+
+"""
+Compare ``VectorStore`` index backends on the same synthetic data: recall@k against
+exact search, query latency and process RSS. Each backend runs in its own
+subprocess so RSS numbers are not polluted by the others.
+
+    python bench_index.py [--n 100000] [--dim 384] [--queries 200] [--k 10]
+        [--backends chroma,numpy-f32,numpy-f16,numpy-i8,numpy-f16-ivf] [--out result.json]
+
+No model is needed: vectors are unit-norm samples around random cluster centres,
+queries are perturbed copies of stored vectors. Backends whose dependencies are
+missing (chromadb) are reported as skipped.
+"""
+from __future__ import annotations
+import argparse, json, os, shutil, subprocess, sys, tempfile, time
+from typing import Any, Dict, List, Optional
+import numpy as np
+from common.mcp_core.bench.stats import percentile
+
+BACKENDS = {
+    "chroma": {"backend": "chroma"},
+    "numpy-f32": {"backend": "numpy", "dtype": "float32"},
+    "numpy-f16": {"backend": "numpy", "dtype": "float16"},
+    "numpy-i8": {"backend": "numpy", "dtype": "int8"},
+    "numpy-f16-ivf": {"backend": "numpy", "dtype": "float16", "nlist": 256, "nprobe": 16},
+}
+
+def make_data(n: int, dim: int, queries: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(max(1, n // 500), dim)).astype(np.float32)
+    x = centres[rng.integers(len(centres), size=n)] + 0.35 * rng.normal(size=(n, dim)).astype(np.float32)
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    q = x[rng.choice(n, size=queries, replace=False)] + 0.05 * rng.normal(size=(queries, dim)).astype(np.float32)
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    return x, q
+
+def exact_topk(x: np.ndarray, q: np.ndarray, k: int) -> np.ndarray:
+    d = (x * x).sum(axis=1)[None, :] - 2 * q @ x.T
+    return np.argsort(d, axis=1)[:, :k]
+
+def rss_mb() -> Optional[float]:
+    # Current RSS (Linux). ru_maxrss is no use here: a child inherits the parent's peak across fork/exec.
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except OSError:
+        return None
+
+def run_backend(name: str, data: str, k: int, workdir: str) -> Dict[str, Any]:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from rag_index import make_index
+    x = np.load(data + ".x.npy", mmap_mode="r")  # paged in as it is indexed, not held by the harness
+    z = np.load(data)
+    q, truth = z["q"], z["truth"]
+    opts = dict(BACKENDS[name])
+    backend = opts.pop("backend")
+    try:
+        index = make_index("bench", backend, path=os.path.join(workdir, name), **opts)
+    except ImportError as e:
+        return {"skipped": str(e)}
+    base = rss_mb()
+    ids = [str(i) for i in range(len(x))]
+    t0 = time.perf_counter()
+    for s in range(0, len(x), 4096):
+        part = slice(s, s + 4096)
+        index.upsert(ids[part], [""] * len(ids[part]), np.asarray(x[part]), [{"content_hash": "-"}] * len(ids[part]))
+    build = time.perf_counter() - t0
+    del x
+    index.query(q[0], k)  # warm-up
+    lat, hits = [], 0
+    for i, v in enumerate(q):
+        t = time.perf_counter()
+        res = index.query(v, k)
+        lat.append((time.perf_counter() - t) * 1000)
+        hits += len({int(doc_id) for doc_id, _ in res} & set(truth[i].tolist()))
+    lat.sort()
+    return {"build_s": round(build, 2), f"recall@{k}": round(hits / (len(q) * k), 4),
+            "p50_ms": percentile(lat, 50), "p95_ms": percentile(lat, 95), "qps": round(len(q) / (sum(lat) / 1000), 1),
+            "rss_before_build_mb": base, "rss_mb": rss_mb()}
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--n", type=int, default=100_000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--backends", default=",".join(BACKENDS))
+    ap.add_argument("--out", help="write the JSON report here as well as to stdout")
+    ap.add_argument("--worker", nargs=3, metavar=("BACKEND", "DATA", "WORKDIR"), help=argparse.SUPPRESS)
+    a = ap.parse_args(argv)
+    if a.worker:
+        print(json.dumps(run_backend(a.worker[0], a.worker[1], a.k, a.worker[2])))
+        return
+    workdir = tempfile.mkdtemp(prefix="bench_index_")
+    try:
+        x, q = make_data(a.n, a.dim, a.queries)
+        data = os.path.join(workdir, "data.npz")
+        np.save(data + ".x.npy", x)
+        np.savez(data, q=q, truth=exact_topk(x, q, a.k))
+        del x, q
+        results = {}
+        for name in [b.strip() for b in a.backends.split(",") if b.strip()]:
+            if name not in BACKENDS:
+                raise SystemExit(f"unknown backend '{name}' (choose from {', '.join(BACKENDS)})")
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--k", str(a.k),
+                                   "--worker", name, data, workdir], capture_output=True, text=True)
+            if proc.returncode:
+                results[name] = {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+            else:
+                results[name] = json.loads(proc.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    report = {"meta": {"n": a.n, "dim": a.dim, "queries": a.queries, "k": a.k, "python": sys.version.split()[0],
+                       "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())},
+              "backends": results}
+    text = json.dumps(report, indent=2)
+    if a.out:
+        with open(a.out, "w") as f:
+            f.write(text)
+    print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+
+"""
+Vector index backends for ``VectorStore``.
+
+- ``ChromaIndex`` — the original chromadb ``PersistentClient`` collection.
+- ``NumpyIndex`` — vectors in a memory-mapped file (float32, float16 or int8 with a
+  per-row scale), ids / content hashes in SQLite, brute-force or IVF top-k in NumPy.
+
+Both return squared L2 distances, so ``search``'s ``threshold`` means the same thing.
+"""
+from __future__ import annotations
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import json, logging, os, sqlite3, threading
+import numpy as np
+
+HASH_KEY = "content_hash"  # metadata field holding the sha1 of the stored text
+
+log = logging.getLogger(__name__)
+
+class ChromaIndex:
+    name = "chroma"
+
+    def __init__(self, collection_name: str = "docs", path: str = ".chroma"):
+        import chromadb
+        self.client = chromadb.PersistentClient(path=path)
+        self.collection = self.client.get_or_create_collection(name=collection_name)
+        self.state_path = os.path.join(path, f"{collection_name}.bm25")
+
+    def hashes(self, ids: List[str]) -> Dict[str, Optional[str]]:
+        stored = self.collection.get(ids=ids, include=["metadatas"])
+        return {i: (m or {}).get(HASH_KEY) for i, m in zip(stored["ids"], stored["metadatas"] or [])}
+
+    def upsert(self, ids: List[str], texts: List[str], embeddings: np.ndarray, metadatas: List[Dict[str, Any]]):
+        self.collection.upsert(ids=ids, documents=texts, embeddings=np.asarray(embeddings).tolist(), metadatas=metadatas)
+
+    def query(self, vector: np.ndarray, n: int) -> List[Tuple[str, float]]:
+        # Only distances are used; skip shipping embeddings / documents / metadatas back.
+        res = self.collection.query(query_embeddings=[np.asarray(vector).tolist()], n_results=n, include=["distances"])
+        if not res["ids"]:
+            return []
+        return [(doc_id, float(d)) for doc_id, d in zip(res["ids"][0], res["distances"][0])]
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def documents(self, page: int = 1000) -> Iterator[Tuple[str, str]]:
+        # All ids in one cheap call, then documents by id: offset paging rescans from the start each page.
+        ids = self.collection.get(include=[])["ids"]
+        for i in range(0, len(ids), page):
+            res = self.collection.get(ids=ids[i:i + page], include=["documents"])
+            yield from zip(res["ids"], res["documents"])
+
+def _kmeans(x: np.ndarray, k: int, iters: int = 10, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    cent = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign = _nearest(x, cent)
+        for j in range(k):
+            members = x[assign == j]
+            cent[j] = members.mean(axis=0) if len(members) else x[rng.integers(len(x))]
+    return cent
+
+def _nearest(x: np.ndarray, cent: np.ndarray) -> np.ndarray:
+    d = (cent * cent).sum(axis=1)[None, :] - 2 * x @ cent.T
+    return d.argmin(axis=1).astype(np.int32)
+
+def _topk(dist: np.ndarray, rows: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    if len(dist) > n:
+        part = np.argpartition(dist, n)[:n]
+        dist, rows = dist[part], rows[part]
+    order = np.argsort(dist, kind="stable")
+    return dist[order], rows[order]
+
+class NumpyIndex:
+    """Memory-mapped flat / IVF index.
+
+    ``dtype`` is ``"float32"``, ``"float16"`` or ``"int8"`` (symmetric per-row
+    scale). With ``nlist > 0`` an IVF coarse quantizer is trained once the index
+    holds ``40 * nlist`` vectors; queries then scan only the ``nprobe`` closest
+    partitions. Updates to an existing id overwrite its row in place.
+
+    Writes land in the memmaps and info.json before the id map is committed to SQLite,
+    so the committed rows (``MAX(row) + 1``, which is what a reopen trusts) always have
+    their vectors on disk. Queries copy the array references under the lock and scan
+    without it; training runs outside the lock too.
+    """
+    name = "numpy"
+    CHUNK = 16384  # rows scored per matmul; keeps the dequantized block cache-sized
+
+    def __init__(self, collection_name: str = "docs", path: str = ".vecindex", dtype: str = "float32",
+                 nlist: int = 0, nprobe: int = 8):
+        if dtype not in ("float32", "float16", "int8"):
+            raise ValueError(f"Unsupported index dtype '{dtype}'")
+        self.dir = os.path.join(path, collection_name)
+        os.makedirs(self.dir, exist_ok=True)
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(os.path.join(self.dir, "docs.db"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS docs(id TEXT PRIMARY KEY, row INTEGER, hash TEXT, doc TEXT, meta TEXT)")
+        self.db.commit()
+        self.info_path = os.path.join(self.dir, "info.json")
+        self.state_path = os.path.join(self.dir, "bm25.pkl")
+        info = {"dtype": dtype, "dim": 0, "count": 0, "capacity": 0, "nlist": nlist}
+        if os.path.exists(self.info_path):
+            with open(self.info_path) as f:
+                info.update(json.load(f))
+        self.dtype, self.dim, self.capacity = info["dtype"], info["dim"], info["capacity"]
+        self.nlist, self.nprobe = info["nlist"], nprobe
+        # The committed id map is the source of truth: rows past it belong to a write that
+        # never committed and are reused by the next one.
+        self.count_ = self.db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM docs").fetchone()[0]
+        if self.count_ != info["count"]:
+            log.warning("%s: info.json count %d, committed rows %d; using the committed rows",
+                        self.dir, info["count"], self.count_)
+        self.capacity = max(self.capacity, self.count_)
+        self.ids: List[str] = [None] * self.count_
+        for doc_id, row in self.db.execute("SELECT id, row FROM docs"):
+            self.ids[row] = doc_id
+        self._train_lock = threading.Lock()
+        cpath = os.path.join(self.dir, "centroids.npy")
+        self.centroids: Optional[np.ndarray] = np.load(cpath) if os.path.exists(cpath) else None
+        self._lists: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._open()
+
+    # --- storage -------------------------------------------------------------
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def _map(self, name: str, dtype, cols: int = 0):
+        shape = (self.capacity, cols) if cols else (self.capacity,)
+        path = self._file(name)
+        if not os.path.exists(path):
+            open(path, "wb").close()
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if os.path.getsize(path) < nbytes:
+            with open(path, "r+b") as f:
+                f.truncate(nbytes)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape) if self.capacity else np.zeros(shape, dtype)
+
+    def _open(self):
+        self.vecs = self._map("vectors.bin", self.dtype, self.dim)
+        self.norms = self._map("norms.f32", np.float32)  # squared norms of the stored (dequantized) rows
+        self.scales = self._map("scales.f32", np.float32) if self.dtype == "int8" else None
+        self.assign = self._map("lists.i32", np.int32)
+
+    def _grow(self, need: int):
+        if need <= self.capacity:
+            return
+        self.flush()
+        self.capacity = max(need, self.capacity * 2, 1024)
+        self._open()
+
+    def _save_info(self):
+        with open(self.info_path, "w") as f:
+            json.dump({"dtype": self.dtype, "dim": self.dim, "count": self.count_, "capacity": self.capacity,
+                       "nlist": self.nlist}, f)
+
+    def flush(self):
+        for m in (self.vecs, self.norms, self.scales, self.assign):
+            if isinstance(m, np.memmap):
+                m.flush()
+
+    def _encode(self, x: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]:
+        if self.dtype == "int8":
+            scale = np.maximum(np.abs(x).max(axis=1), 1e-12) / 127.0
+            q = np.clip(np.rint(x / scale[:, None]), -127, 127).astype(np.int8)
+            deq = q.astype(np.float32) * scale[:, None]
+            return q, scale.astype(np.float32), (deq * deq).sum(axis=1)
+        q = x.astype(self.dtype)
+        deq = q.astype(np.float32)
+        return q, None, (deq * deq).sum(axis=1)
+
+    def _rows(self, start: int, stop: int, rows: Optional[np.ndarray] = None, vecs=None, scales=None) -> np.ndarray:
+        vecs, scales = (self.vecs, self.scales) if vecs is None else (vecs, scales)
+        sel = slice(start, stop) if rows is None else rows[start:stop]
+        x = np.asarray(vecs[sel], dtype=np.float32)
+        if scales is not None:
+            x *= np.asarray(scales[sel])[:, None]
+        return x
+
+    def _dots(self, start: int, stop: int, rows: Optional[np.ndarray], qv: np.ndarray, vecs, scales) -> np.ndarray:
+        # Dot products against the stored rows; int8 rows are scaled after the matmul.
+        sel = slice(start, stop) if rows is None else rows[start:stop]
+        x = vecs[sel]
+        dots = (x if self.dtype == "float32" else x.astype(np.float32)) @ qv
+        if scales is not None:
+            dots *= scales[sel]
+        return dots
+
+    # --- index API -----------------------------------------------------------
+
+    def hashes(self, ids: List[str]) -> Dict[str, Optional[str]]:
+        out = {}
+        with self.lock:
+            for i in range(0, len(ids), 500):
+                part = ids[i:i+500]
+                q = f"SELECT id, hash FROM docs WHERE id IN ({','.join('?' * len(part))})"
+                out.update(self.db.execute(q, part).fetchall())
+        return out
+
+    def upsert(self, ids: List[str], texts: List[str], embeddings: np.ndarray, metadatas: List[Dict[str, Any]]):
+        x = np.asarray(embeddings, dtype=np.float32)
+        with self.lock:
+            if not self.dim:
+                self.dim = x.shape[1]
+                self._open()
+            elif x.shape[1] != self.dim:
+                raise ValueError(f"Embedding dim {x.shape[1]} does not match index dim {self.dim}")
+            existing = dict(self.db.execute(
+                f"SELECT id, row FROM docs WHERE id IN ({','.join('?' * len(ids))})", ids).fetchall())
+            old_count = self.count_
+            rows = []
+            try:
+                for doc_id in ids:
+                    if doc_id in existing:
+                        rows.append(existing[doc_id])
+                    else:
+                        rows.append(self.count_)
+                        self.ids.append(doc_id)
+                        self.count_ += 1
+                self._grow(self.count_)
+                rows = np.asarray(rows, dtype=np.int64)
+                q, scale, norms = self._encode(x)
+                self.vecs[rows] = q
+                self.norms[rows] = norms
+                if scale is not None:
+                    self.scales[rows] = scale
+                if self.centroids is not None:
+                    self.assign[rows] = _nearest(x, self.centroids)
+                    self._lists = None
+                # Vectors and info first: a crash before the commit below leaves only unreferenced rows.
+                self.flush()
+                self._save_info()
+                self.db.executemany("INSERT OR REPLACE INTO docs(id, row, hash, doc, meta) VALUES(?, ?, ?, ?, ?)",
+                                    [(i, int(r), (m or {}).get(HASH_KEY), t, json.dumps(m or {}))
+                                     for i, r, t, m in zip(ids, rows, texts, metadatas)])
+                self.db.commit()
+            except BaseException:
+                self.db.rollback()
+                del self.ids[old_count:]
+                self.count_ = old_count
+                self._lists = None
+                raise
+            due = self.nlist and self.centroids is None and self.count_ >= 40 * self.nlist
+        if due:
+            try:
+                self.train(self.nlist)
+            except Exception:
+                # The upsert itself is committed; queries stay exact (flat) and the next upsert retries.
+                log.exception("%s: IVF training failed", self.dir)
+
+    def train(self, nlist: int, sample: int = 100_000):
+        """(Re)build the IVF coarse quantizer from a sample and reassign every row.
+
+        k-means and the bulk reassignment run without the lock (queries keep using the
+        previous quantizer); only rows added meanwhile are assigned while holding it."""
+        with self._train_lock:
+            with self.lock:
+                n, vecs, scales = self.count_, self.vecs, self.scales
+            rng = np.random.default_rng(0)
+            pick = np.sort(rng.choice(n, size=min(sample, n), replace=False))
+            centroids = _kmeans(self._rows(0, len(pick), pick, vecs, scales), nlist)
+            assign = np.empty(n, dtype=np.int32)
+            for start in range(0, n, self.CHUNK):
+                stop = min(start + self.CHUNK, n)
+                assign[start:stop] = _nearest(self._rows(start, stop, None, vecs, scales), centroids)
+            with self.lock:
+                # Rows rewritten during training may be assigned to a slightly stale partition;
+                # they are still found, just possibly with a worse probe order.
+                self.assign[:n] = assign
+                if self.count_ > n:
+                    self.assign[n:self.count_] = _nearest(self._rows(n, self.count_), centroids)
+                self.flush()
+                np.save(self._file("centroids.npy"), centroids)
+                self.centroids = centroids
+                self.nlist = nlist
+                self._lists = None
+                self._save_info()
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._lists is None:
+            assign = np.asarray(self.assign[:self.count_])
+            order = np.argsort(assign, kind="stable")
+            offsets = np.searchsorted(assign[order], np.arange(len(self.centroids) + 1))
+            self._lists = (order, offsets)
+        return self._lists
+
+    def query(self, vector: np.ndarray, n: int) -> List[Tuple[str, float]]:
+        qv = np.asarray(vector, dtype=np.float32).reshape(-1)
+        with self.lock:
+            # Snapshot: rows below ``count`` are committed and the arrays are only ever replaced
+            # (on growth or retraining), so the scan below needs no lock.
+            count, centroids, ids = self.count_, self.centroids, self.ids
+            vecs, norms, scales = self.vecs, self.norms, self.scales
+            lists = self._inverted_lists() if centroids is not None else None
+        if not count:
+            return []
+        if lists is not None:
+            order, offsets = lists
+            cd = ((centroids - qv) ** 2).sum(axis=1)
+            probe = np.argsort(cd)[:self.nprobe]
+            cand = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probe])
+            cand.sort()  # sequential access into the memmap
+        else:
+            cand = None
+        total = count if cand is None else len(cand)
+        best_d, best_r = np.empty(0, np.float32), np.empty(0, np.int64)
+        qn = float(qv @ qv)
+        for start in range(0, total, self.CHUNK):
+            stop = min(start + self.CHUNK, total)
+            rows = np.arange(start, stop) if cand is None else cand[start:stop]
+            d = np.asarray(norms[rows]) + qn - 2 * self._dots(start, stop, cand, qv, vecs, scales)
+            best_d, best_r = _topk(np.concatenate([best_d, d]), np.concatenate([best_r, rows]), n)
+        return [(ids[r], float(max(d, 0.0))) for d, r in zip(best_d, best_r) if ids[r] is not None]
+
+    def count(self) -> int:
+        return self.count_
+
+    def documents(self, page: int = 1000) -> Iterator[Tuple[str, str]]:
+        last = -1
+        while True:
+            with self.lock:
+                rows = self.db.execute("SELECT row, id, doc FROM docs WHERE row > ? ORDER BY row LIMIT ?",
+                                       (last, page)).fetchall()
+            if not rows:
+                return
+            for last, doc_id, doc in rows:
+                yield doc_id, doc
+
+def make_index(collection_name: str = "docs", backend: Optional[str] = None, **opts):
+    """Index chosen by ``backend`` or ``RAG_INDEX`` (``chroma`` by default, or ``numpy``).
+
+    ``RAG_INDEX_DTYPE``, ``RAG_INDEX_NLIST`` and ``RAG_INDEX_NPROBE`` configure the NumPy backend.
+    """
+    backend = backend or os.getenv("RAG_INDEX", "chroma")
+    if backend == "chroma":
+        return ChromaIndex(collection_name, **opts)
+    if backend == "numpy":
+        opts.setdefault("dtype", os.getenv("RAG_INDEX_DTYPE", "float32"))
+        opts.setdefault("nlist", int(os.getenv("RAG_INDEX_NLIST", "0")))
+        opts.setdefault("nprobe", int(os.getenv("RAG_INDEX_NPROBE", "8")))
+        return NumpyIndex(collection_name, **opts)
+    raise ValueError(f"Unknown index backend '{backend}'")
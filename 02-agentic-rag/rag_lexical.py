@@ -0,0 +1,111 @@
+
+"""
+In-process BM25 inverted index, kept in sync with ``VectorStore`` upserts, plus
+reciprocal rank fusion for combining it with vector results.
+"""
+from __future__ import annotations
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import math, os, pickle, re, threading
+
+# Words plus identifier-like runs such as "ERR_CONN_RESET", "E-1042", "v2.3.1" or "pkg.mod:fn",
+# so error codes and names survive tokenization as single terms.
+_TOKEN = re.compile(r"[A-Za-z0-9_]+(?:[-.:/][A-Za-z0-9_]+)*")
+
+def tokenize(text: str) -> List[str]:
+    return [t.lower() for t in _TOKEN.findall(text)]
+
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self.lock = threading.RLock()
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_ids: List[str] = []
+        self.doc_len: List[int] = []
+        self.doc_terms: List[Tuple[str, ...]] = []
+        self.slot: Dict[str, int] = {}
+        self.total_len = 0
+
+    def __len__(self) -> int:
+        return len(self.slot)
+
+    def upsert(self, ids: Sequence[str], texts: Sequence[str]):
+        with self.lock:
+            for doc_id, text in zip(ids, texts):
+                tf = Counter(tokenize(text))
+                i = self.slot.get(doc_id)
+                if i is None:
+                    i = self.slot[doc_id] = len(self.doc_ids)
+                    self.doc_ids.append(doc_id)
+                    self.doc_len.append(0)
+                    self.doc_terms.append(())
+                else:
+                    self._unindex(i)
+                for term, n in tf.items():
+                    self.postings.setdefault(term, {})[i] = n
+                self.doc_len[i] = sum(tf.values())
+                self.doc_terms[i] = tuple(tf)
+                self.total_len += self.doc_len[i]
+
+    def _unindex(self, i: int):
+        for term in self.doc_terms[i]:
+            plist = self.postings.get(term)
+            if plist is not None:
+                plist.pop(i, None)
+                if not plist:
+                    del self.postings[term]
+        self.total_len -= self.doc_len[i]
+
+    def save(self, path: str, stamp: int):
+        """Write the index to ``path`` (atomically); ``stamp`` identifies the state it reflects."""
+        with self.lock:
+            state = {"k1": self.k1, "b": self.b, "stamp": stamp, "postings": self.postings, "doc_ids": self.doc_ids,
+                     "doc_len": self.doc_len, "doc_terms": self.doc_terms, "total_len": self.total_len}
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, stamp: int) -> Optional["BM25Index"]:
+        """The index saved at ``path`` if it exists and was saved with ``stamp``, else None."""
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if state.get("stamp") != stamp:
+            return None
+        idx = cls(state["k1"], state["b"])
+        idx.postings, idx.doc_ids, idx.doc_len = state["postings"], state["doc_ids"], state["doc_len"]
+        idx.doc_terms, idx.total_len = state["doc_terms"], state["total_len"]
+        idx.slot = {d: i for i, d in enumerate(idx.doc_ids)}
+        return idx
+
+    def search(self, query: str, n: int = 10) -> List[Tuple[str, float]]:
+        """Top ``n`` ``(id, bm25_score)`` pairs; documents sharing no term are never returned."""
+        terms = set(tokenize(query))
+        with self.lock:
+            N = len(self.slot)
+            if not N or not terms:
+                return []
+            avg = self.total_len / N or 1.0
+            scores: Dict[int, float] = {}
+            for term in terms:
+                plist = self.postings.get(term)
+                if not plist:
+                    continue
+                idf = math.log(1 + (N - len(plist) + 0.5) / (len(plist) + 0.5))
+                for i, f in plist.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_len[i] / avg)
+                    scores[i] = scores.get(i, 0.0) + idf * f * (self.k1 + 1) / (f + norm)
+            best = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:n]
+            return [(self.doc_ids[i], round(s, 4)) for i, s in best]
+
+def rrf(rankings: Iterable[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Reciprocal rank fusion: ``score(d) = sum(1 / (k + rank))`` over the rankings containing ``d``."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
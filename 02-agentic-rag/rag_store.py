@@ -1,24 +1,116 @@
 
-import chromadb
-from sentence_transformers import SentenceTransformer
-from typing import List, Tuple
+from common.mcp_core.embeddings import get_embedding_service
+from common.mcp_core.util import batches
+from rag_index import HASH_KEY, make_index
+from rag_lexical import BM25Index
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import atexit, hashlib, json, os, threading, time
+
+# Seconds between BM25 snapshot writes while documents keep arriving (also saved at exit).
+LEXICAL_SAVE_INTERVAL = float(os.getenv("RAG_BM25_SAVE_S", "30"))
+
+Doc = Union[Dict[str, Any], Tuple[str, str], Tuple[str, str, Optional[Dict[str, Any]]]]
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield ``{"id", "text", "metadata"?}`` objects from a JSONL file, one line at a time."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def _normalize(doc: Doc) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    if isinstance(doc, dict):
+        return str(doc["id"]), doc["text"], doc.get("metadata")
+    return str(doc[0]), doc[1], doc[2] if len(doc) > 2 else None
 
 class VectorStore:
-    def __init__(self, collection_name: str = "docs"):
-        self.client = chromadb.PersistentClient(path=".chroma")
-        self.collection = self.client.get_or_create_collection(name=collection_name)
-        self.embedder = SentenceTransformer("all-MiniLM-L6-v2")
+    def __init__(self, collection_name: str = "docs", backend: Optional[str] = None):
+        # Chroma by default; RAG_INDEX=numpy selects the memory-mapped NumPy index (see rag_index.py).
+        self.index = make_index(collection_name, backend)
+        # Shared micro-batching encoder with an embedding cache (see common/mcp_core/embeddings.py)
+        self.embedder = get_embedding_service("all-MiniLM-L6-v2").load()
+        # BM25 over the same documents, updated on every upsert. It is loaded from the snapshot
+        # next to the index. If that is missing or stale, it is rebuilt from the index once.
+        self._lexical_lock = threading.Lock()
+        self._lexical_dirty = False
+        self.lexical = BM25Index.load(self.index.state_path, self.index.count())
+        if self.lexical is None:
+            self.lexical = BM25Index()
+            for batch in batches(self.index.documents(), 1000):
+                self.lexical.upsert([d[0] for d in batch], [d[1] or "" for d in batch])
+            self.lexical.save(self.index.state_path, self.index.count())
+        self._lexical_saved = time.monotonic()
+        atexit.register(self.save_lexical)
+
+    def save_lexical(self):
+        """Snapshot BM25 if documents changed since the last save."""
+        with self._lexical_lock:
+            if self._lexical_dirty:
+                self.lexical.save(self.index.state_path, self.index.count())
+                self._lexical_dirty = False
+                self._lexical_saved = time.monotonic()
+
+    def _lexical_stale(self):
+        # Drop the snapshot before the index changes, so a crash before the next save means a rebuild, not stale BM25.
+        with self._lexical_lock:
+            if not self._lexical_dirty:
+                try:
+                    os.remove(self.index.state_path)
+                except FileNotFoundError:
+                    pass
+                self._lexical_dirty = True
 
     def add(self, ids: List[str], texts: List[str], metadatas=None):
-        embs = self.embedder.encode(texts).tolist()
-        self.collection.add(ids=ids, documents=texts, embeddings=embs, metadatas=metadatas)
+        """Upsert ``texts`` under ``ids``; documents whose text is unchanged are skipped."""
+        metas = metadatas or [None] * len(ids)
+        return self._upsert_batch(list(zip(ids, texts, metas)))
+
+    def _upsert_batch(self, docs: List[Tuple[str, str, Optional[Dict[str, Any]]]]) -> Dict[str, int]:
+        # Last occurrence wins for ids repeated within a batch (chroma rejects duplicate ids).
+        latest = {doc_id: (text, meta) for doc_id, text, meta in docs}
+        known = self.index.hashes(list(latest))
+        ids, texts, metas = [], [], []
+        for doc_id, (text, meta) in latest.items():
+            h = content_hash(text)
+            if known.get(doc_id) == h:
+                continue
+            ids.append(doc_id)
+            texts.append(text)
+            metas.append({**(meta or {}), HASH_KEY: h})
+        if ids:
+            vectors = self.embedder.encode(texts)
+            self._lexical_stale()
+            self.index.upsert(ids, texts, vectors, metas)
+            self.lexical.upsert(ids, texts)
+            if time.monotonic() - self._lexical_saved > LEXICAL_SAVE_INTERVAL:
+                self.save_lexical()
+        return {"seen": len(docs), "written": len(ids), "skipped": len(docs) - len(ids)}
+
+    def upsert_stream(self, docs: Iterable[Doc], batch_size: int = 256) -> Iterator[Dict[str, Any]]:
+        """Embed and upsert ``docs`` in fixed-size batches, yielding progress after each one.
+
+        Only one batch is held in memory, so the input can be an arbitrarily large
+        iterator (e.g. :func:`iter_jsonl`). Unchanged documents (same content hash)
+        are skipped without being embedded.
+        """
+        totals = {"seen": 0, "written": 0, "skipped": 0, "batches": 0}
+        t0 = time.perf_counter()
+        for raw in batches(docs, batch_size):
+            batch = [_normalize(d) for d in raw]
+            for k, v in self._upsert_batch(batch).items():
+                totals[k] += v
+            totals["batches"] += 1
+            elapsed = time.perf_counter() - t0
+            yield {**totals, "elapsed_s": round(elapsed, 3),
+                   "docs_per_s": round(totals["seen"] / elapsed, 1) if elapsed else None}
+        self.save_lexical()
 
     def query(self, text: str, n: int = 3) -> List[Tuple[str,float]]:
-        q = self.embedder.encode([text]).tolist()
-        res = self.collection.query(query_embeddings=q, n_results=n, include=["embeddings","documents","metadatas", "distances"])
-        out = []
-        if res["ids"]:
-            for i,doc_id in enumerate(res["ids"][0]):
-                dist = res["distances"][0][i]
-                out.append((doc_id, float(dist)))
-        return out
+        return self.index.query(self.embedder.encode([text])[0], n)
+
+    def lexical_query(self, text: str, n: int = 3) -> List[Tuple[str, float]]:
+        """BM25 ``(id, score)`` pairs, higher is better; no embedding needed."""
+        return self.lexical.search(text, n)
@@ -0,0 +1,69 @@
+
+# Tool implementations for app.py; imported lazily on the first call (or at warm-up).
+from functools import lru_cache
+from typing import List
+import asyncio
+from common.mcp_core.tools import invalidate_cache, current_cancel_token, get_executor
+from rag_lexical import rrf
+from rag_store import VectorStore, iter_jsonl
+
+@lru_cache(maxsize=None)
+def get_store() -> VectorStore:
+    return VectorStore()
+
+def ingest(ids: List[str], texts: List[str]):
+    res = get_store().add(ids, texts)
+    if res["written"]:
+        invalidate_cache("search")
+    return {"ok": True, "count": len(ids), "written": res["written"], "skipped": res["skipped"]}
+
+def _ingest_jsonl(path: str, batch_size: int):
+    token = current_cancel_token()
+    written = 0
+    try:
+        for progress in get_store().upsert_stream(iter_jsonl(path), batch_size=batch_size):
+            written = progress["written"]
+            yield progress
+            token.raise_if_cancelled()  # stop between batches once the caller times out
+    finally:
+        if written:
+            invalidate_cache("search")
+
+def ingest_jsonl(path: str, batch_size: int = 256):
+    # Bulk upsert from a JSONL file of {"id", "text", "metadata"?} lines; memory stays flat.
+    progress = {"seen": 0, "written": 0, "skipped": 0, "batches": 0, "elapsed_s": 0.0, "docs_per_s": None}
+    for progress in _ingest_jsonl(path, batch_size):
+        pass
+    return {"ok": True, **progress}
+
+def ingest_jsonl_stream(path: str, batch_size: int = 256):
+    # Same as ingest_jsonl but yields progress after every batch; use via POST /rpc/stream
+    yield from _ingest_jsonl(path, batch_size)
+
+async def search(query: str, threshold: float = 0.4, k: int = 3, mode: str = "hybrid"):
+    """Vector and BM25 retrieval run concurrently, fused with reciprocal rank fusion.
+
+    Vector hits count only below ``threshold`` (squared L2); any BM25 match counts, so
+    exact identifiers and error codes are found without relying on the embedding.
+    ``mode="lexical"`` skips embedding the query altogether, ``mode="vector"`` skips BM25.
+    """
+    if mode not in ("hybrid", "vector", "lexical"):
+        raise ValueError(f"Unknown search mode '{mode}'")
+    store = get_store()
+    loop = asyncio.get_running_loop()
+    ex = get_executor("default")
+    depth = max(k * 4, 10)  # deeper candidate lists give the fusion something to agree on
+    vec, lex = await asyncio.gather(
+        loop.run_in_executor(ex, store.query, query, depth) if mode != "lexical" else _nothing(),
+        loop.run_in_executor(ex, store.lexical_query, query, depth) if mode != "vector" else _nothing())
+    vec = [h for h in vec if h[1] < threshold]
+    if not vec and not lex:
+        # fallback to "web search" placeholder
+        return {"mode": "fallback", "hits": [{"title":"Fallback search result", "url":"https://example.com"}]}
+    dist, bm25 = dict(vec), dict(lex)
+    hits = [{"id": doc_id, "rrf": round(score, 5), "distance": dist.get(doc_id), "bm25": bm25.get(doc_id)}
+            for doc_id, score in rrf([[d for d, _ in vec], [d for d, _ in lex]])[:k]]
+    return {"mode": "hybrid" if vec and lex else "vector" if vec else "lexical", "hits": hits}
+
+async def _nothing():
+    return []
@@ -0,0 +1,97 @@
+
+# Tool implementations for app.py; yfinance / pandas_ta are imported lazily on first call.
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Union
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+from ohlc_store import OHLCStore
+
+@lru_cache(maxsize=None)
+def get_store() -> OHLCStore:
+    # Source from OHLC_SOURCE ("yfinance" or the synthetic "offline" stand-in).
+    return OHLCStore()
+
+def fetch_ohlc(ticker: str = "AAPL", period: str = "6mo", interval: str = "1d"):
+    df = get_store().get(ticker, period=period, interval=interval)
+    return {"rows": min(len(df), 5), "cols": list(df.columns), "sample": df.head(5).reset_index().astype(str).to_dict(orient="records")}
+
+def analyze_trend(ticker: str = "AAPL", period: str = "6mo"):
+    df = get_store().get(ticker, period=period, interval="1d").copy()
+    if df.empty:
+        return {"error": "No data"}
+    df["rsi"] = ta.rsi(df["Close"], length=14)
+    df["ema20"] = ta.ema(df["Close"], length=20)
+    signal = "neutral"
+    if df["Close"].iloc[-1] > df["ema20"].iloc[-1] and df["rsi"].iloc[-1] < 70:
+        signal = "bullish"
+    elif df["Close"].iloc[-1] < df["ema20"].iloc[-1] and df["rsi"].iloc[-1] > 30:
+        signal = "bearish"
+    return {"signal": signal, "latest": df.tail(1).reset_index().astype(str).to_dict("records")[0]}
+
+def _load_panel(tickers: List[str], period: str, max_workers: int) -> pd.DataFrame:
+    """Close prices as one wide frame (dates x tickers), loaded concurrently from the store."""
+    store = get_store()
+
+    def close(t: str):
+        try:
+            return t, store.get(t, period=period, interval="1d")["Close"]
+        except Exception:
+            return t, None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers)))) as ex:
+        series = {t: c for t, c in ex.map(close, tickers) if c is not None and len(c)}
+    return pd.DataFrame(series).sort_index()
+
+def _ema(panel: pd.DataFrame, length: int) -> pd.DataFrame:
+    """Column-wise EMA seeded like ``ta.ema``: SMA of each column's first ``length`` values, then ``adjust=False``."""
+    n = panel.notna().cumsum()
+    seed = panel.where(n <= length).sum() / length
+    at_seed = (n == length) & panel.notna()
+    seeded = panel.where(n > length).mask(at_seed, np.broadcast_to(seed.to_numpy(), panel.shape))
+    return seeded.ewm(span=length, adjust=False, ignore_na=True).mean().where(panel.notna())
+
+def _rsi(panel: pd.DataFrame, length: int) -> pd.DataFrame:
+    """Column-wise RSI as ``ta.rsi``: RMA (``ewm(alpha=1/length, min_periods=length)``) of gains and losses."""
+    delta = (panel - panel.ffill().shift()).where(panel.notna())  # gaps in the panel are skipped, not diffed across
+    rma = lambda x: x.ewm(alpha=1 / length, min_periods=length, ignore_na=True).mean().where(panel.notna())
+    gain, loss = rma(delta.clip(lower=0)), rma(-delta.clip(upper=0))
+    return 100 * gain / (gain + loss)
+
+def screen(tickers: Union[List[str], str], period: str = "6mo", rank_by: str = "momentum", top: int = 20,
+           max_workers: int = 16):
+    """Indicators for a whole universe in one vectorized pass over a wide Close panel.
+
+    EMA20 and RSI14 are column-wise ``ewm`` over the panel, seeded as pandas_ta does, so
+    they match analyze_trend and the per-ticker Python work is just the concurrent loads.
+    Each column skips the dates it has no bar for. Signals follow analyze_trend:
+    bullish above EMA20 with RSI < 70, bearish below it with RSI > 30. Results are ranked by
+    ``rank_by``: ``momentum`` (20-bar return), ``ema_gap`` (close / EMA20 - 1) or ``rsi``.
+    """
+    if isinstance(tickers, str):
+        tickers = [t.strip() for t in tickers.split(",") if t.strip()]
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    if rank_by not in ("momentum", "ema_gap", "rsi"):
+        return {"error": f"Unknown rank_by '{rank_by}'"}
+    panel = _load_panel(tickers, period, max_workers)
+    missing = [t for t in tickers if t not in panel.columns]
+    if panel.empty:
+        return {"error": "No data", "missing": missing}
+    ema, rsi = _ema(panel, 20), _rsi(panel, 14)
+    # Last available value per ticker (calendars may differ across the universe).
+    last = pd.DataFrame({"close": panel.ffill().iloc[-1], "ema20": ema.ffill().iloc[-1], "rsi": rsi.ffill().iloc[-1],
+                         "momentum": panel.ffill().iloc[-1] / panel.ffill().shift(20).iloc[-1] - 1,
+                         "as_of": panel.apply(pd.Series.last_valid_index)})
+    last["ema_gap"] = last["close"] / last["ema20"] - 1
+    last["signal"] = np.select([(last["close"] > last["ema20"]) & (last["rsi"] < 70),
+                                (last["close"] < last["ema20"]) & (last["rsi"] > 30)], ["bullish", "bearish"], "neutral")
+    last = last.sort_values(rank_by, ascending=False, na_position="last")
+    last["as_of"] = last["as_of"].astype(str)
+    ranked = last.head(top).reset_index(names="ticker").round(4)
+    return {"universe": len(tickers), "screened": len(last), "missing": missing,
+            "signals": last["signal"].value_counts().to_dict(),
+            "ranked": ranked.replace({np.nan: None}).to_dict(orient="records")}
+
+def store_stats():
+    return get_store().stats()
@@ -0,0 +1,179 @@
+
+"""
+Local OHLC store: one Parquet file per (interval, ticker) under ``.cache/ohlc``.
+
+Reads come from the file; only bars missing from the requested range (the tail since
+the last stored bar, or history older than the first one) are fetched from the
+``DataSource`` and merged in. Sources are pluggable: ``YFinanceSource`` for real data,
+``OfflineSource`` for deterministic synthetic bars (tests, demos, no network).
+"""
+from __future__ import annotations
+from typing import Dict, Optional
+import hashlib, json, os, re, threading, time
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+_PERIOD = re.compile(r"^(\d+)(d|wk|mo|y)$")
+
+def period_start(period: str, now: Optional[pd.Timestamp] = None) -> Optional[pd.Timestamp]:
+    """First timestamp covered by a yfinance-style period ("5d", "6mo", "1y", "ytd", "max")."""
+    now = pd.Timestamp.now(tz="UTC") if now is None else now
+    if now.tzinfo is not None:
+        now = now.tz_convert("UTC").tz_localize(None)
+    if period == "max":
+        return None
+    if period == "ytd":
+        return pd.Timestamp(year=now.year, month=1, day=1)
+    m = _PERIOD.match(period)
+    if not m:
+        raise ValueError(f"Unsupported period '{period}'")
+    n, unit = int(m.group(1)), m.group(2)
+    offset = {"d": pd.DateOffset(days=n), "wk": pd.DateOffset(weeks=n), "mo": pd.DateOffset(months=n),
+              "y": pd.DateOffset(years=n)}[unit]
+    return (now - offset).normalize()
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    if isinstance(df.columns, pd.MultiIndex):  # yfinance >= 0.2.48 returns (Price, Ticker) columns
+        df = df.droplevel(-1, axis=1) if df.columns.nlevels > 1 else df
+    df = df[[c for c in COLUMNS if c in df.columns]].copy()
+    idx = pd.DatetimeIndex(df.index)
+    if idx.tz is not None:
+        idx = idx.tz_convert("UTC").tz_localize(None)
+    df.index = idx.rename("Date")
+    return df[~df.index.duplicated(keep="last")].sort_index()
+
+class DataSource:
+    """Provider interface: bars in ``[start, end)`` (either may be None) as a DataFrame with
+    a DatetimeIndex and Open/High/Low/Close/Volume columns."""
+    name = "base"
+
+    def fetch(self, ticker: str, interval: str, start: Optional[pd.Timestamp] = None,
+              end: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        raise NotImplementedError
+
+class YFinanceSource(DataSource):
+    name = "yfinance"
+
+    def fetch(self, ticker, interval, start=None, end=None):
+        import yfinance as yf
+        kwargs = {"start": start, "end": end} if start is not None else {"period": "max"}
+        return yf.download(ticker, interval=interval, auto_adjust=True, progress=False, **kwargs)
+
+class OfflineSource(DataSource):
+    """Deterministic synthetic bars: each price is a pure function of (ticker, timestamp),
+    so any range can be generated on its own and incremental fetches line up exactly."""
+    name = "offline"
+    FREQ = {"1d": "B", "1h": "h", "30m": "30min", "15m": "15min", "5m": "5min", "1m": "min"}
+    EPOCH = pd.Timestamp("2000-01-03")
+
+    def __init__(self):
+        self.calls = 0
+
+    def fetch(self, ticker, interval, start=None, end=None):
+        self.calls += 1
+        freq = self.FREQ.get(interval, "B")
+        now = pd.Timestamp.now(tz="UTC").tz_localize(None)
+        end = now if end is None else min(end, now)
+        if start is None:
+            start = self.EPOCH if freq == "B" else end - pd.Timedelta(days=30)
+        idx = pd.date_range(max(start, self.EPOCH), end, freq=freq, inclusive="left")
+        rng = np.random.default_rng(int(hashlib.sha1(ticker.upper().encode()).hexdigest()[:8], 16))
+        phase, speed, drift = rng.uniform(0, 2 * np.pi, 3), rng.uniform(0.5, 2.0, 3), rng.normal(0, 2e-4)
+        t = (idx.asi8 - self.EPOCH.value) / 86_400e9  # days since epoch
+        log_p = (drift * t + 0.20 * np.sin(t / (90 * speed[0]) + phase[0]) + 0.06 * np.sin(t / (11 * speed[1]) + phase[1])
+                 + 0.02 * np.sin(t * 1.7 * speed[2] + phase[2]))
+        # Per-bar jitter that is still a pure function of the timestamp (classic sin-hash).
+        log_p += 0.012 * (np.modf(np.abs(np.sin(t * 12.9898 + phase[0]) * 43758.5453))[0] - 0.5)
+        close = 100 * np.exp(log_p)
+        open_ = 100 * np.exp(log_p - 0.01 * np.sin(t * 3.1 + phase[2]))
+        df = pd.DataFrame({"Open": open_, "Close": close}, index=idx)
+        df["High"] = df[["Open", "Close"]].max(axis=1) * 1.004
+        df["Low"] = df[["Open", "Close"]].min(axis=1) * 0.996
+        df["Volume"] = (1e6 * (1.5 + np.sin(t * 0.7 + phase[0]))).astype("int64")
+        return df[COLUMNS]
+
+def make_source(name: Optional[str] = None) -> DataSource:
+    name = name or os.getenv("OHLC_SOURCE", "yfinance")
+    if name == "yfinance":
+        return YFinanceSource()
+    if name == "offline":
+        return OfflineSource()
+    raise ValueError(f"Unknown OHLC source '{name}'")
+
+class OHLCStore:
+    """Parquet-backed bars per (interval, ticker) with incremental refresh.
+
+    A ticker's tail is re-fetched (from its last stored bar, so a partial bar is
+    replaced) at most once per ``max_age`` seconds; older history is fetched only
+    when a request reaches further back than what is stored.
+    """
+    def __init__(self, root: str = ".cache/ohlc", source: Optional[DataSource] = None,
+                 max_age: Dict[str, float] = None):
+        self.root = root
+        self.source = source or make_source()
+        self.max_age = {"1d": 900.0, **(max_age or {})}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        self.fetches = 0
+
+    def path(self, ticker: str, interval: str) -> str:
+        return os.path.join(self.root, interval, f"{ticker.upper()}.parquet")
+
+    def _lock(self, key: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _read(self, path: str):
+        if not os.path.exists(path):
+            return None, {}
+        meta = {}
+        if os.path.exists(path + ".json"):
+            with open(path + ".json") as f:
+                meta = json.load(f)
+        return pd.read_parquet(path), meta
+
+    def _write(self, path: str, df: pd.DataFrame, meta: dict):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        df.to_parquet(tmp)
+        os.replace(tmp, path)  # readers never see a half-written file
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path + ".json")
+
+    def _fetch(self, ticker: str, interval: str, start=None, end=None) -> pd.DataFrame:
+        self.fetches += 1
+        return _normalize(self.source.fetch(ticker, interval, start, end))
+
+    def get(self, ticker: str, period: str = "6mo", interval: str = "1d") -> pd.DataFrame:
+        """Bars for ``period`` back from now, fetching only what the store lacks."""
+        start = period_start(period)
+        path = self.path(ticker, interval)
+        with self._lock(path):
+            df, meta = self._read(path)
+            # "from": earliest start already requested from the source (None = full history),
+            # so tickers whose history begins later are not re-fetched on every call.
+            covered = "from" in meta and (meta["from"] is None or (start is not None and pd.Timestamp(meta["from"]) <= start))
+            if df is None or df.empty:
+                df = self._fetch(ticker, interval, start)
+                meta = {"from": None if start is None else start.isoformat(), "refreshed": time.time()}
+                self._write(path, df, meta)
+            else:
+                parts = []
+                if not covered:
+                    parts.append(self._fetch(ticker, interval, start, df.index[0]))
+                    meta["from"] = None if start is None else start.isoformat()
+                if time.time() - meta.get("refreshed", 0) > self.max_age.get(interval, 60.0):
+                    parts.append(self._fetch(ticker, interval, df.index[-1]))  # also replaces a partial last bar
+                    meta["refreshed"] = time.time()
+                if parts:
+                    df = _normalize(pd.concat([df, *parts]))
+                    self._write(path, df, meta)
+        return df if start is None else df[df.index >= start]
+
+    def stats(self) -> Dict[str, object]:
+        files = [os.path.join(d, f) for d, _, fs in os.walk(self.root) for f in fs if f.endswith(".parquet")]
+        return {"source": self.source.name, "fetches": self.fetches, "files": len(files),
+                "bytes": sum(os.path.getsize(f) for f in files)}
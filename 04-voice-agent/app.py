@@ -1,33 +1,31 @@
 
 from common.mcp_core.server import app as base_app
-from common.mcp_core.tools import tool
-import sqlite3, os
+from common.mcp_core.tools import tool, get_executor
+from common.mcp_core.cache import MISS
+from fact_db import FactDB, init_db
+import asyncio, os
 
 DB_PATH = "voice_agent.db"
-if not os.path.exists(DB_PATH):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("CREATE TABLE facts (id INTEGER PRIMARY KEY, topic TEXT, content TEXT)")
-    c.executemany("INSERT INTO facts(topic,content) VALUES(?,?)", [
-        ("python","Python 3.12 introduced many performance improvements."),
-        ("fastapi","FastAPI is a high-performance ASGI framework for Python."),
-    ])
-    conn.commit()
-    conn.close()
+init_db(DB_PATH, seed=[
+    ("python","Python 3.12 introduced many performance improvements."),
+    ("fastapi","FastAPI is a high-performance ASGI framework for Python."),
+])
+facts = FactDB(DB_PATH, pool_size=int(os.getenv("VOICE_DB_POOL", "4")))
 
 app = base_app
 
 @tool("query_db")
-def query_db(topic: str):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT content FROM facts WHERE topic = ?", (topic,))
-    row = c.fetchone()
-    conn.close()
-    if row:
-        return {"answer": row[0], "mode": "db"}
-    return {"answer": "No local fact found. You may fall back to web search.", "mode":"fallback"}
+async def query_db(topic: str):
+    # Hot answers are served on the event loop; only misses take a pooled connection on a worker thread.
+    hit = facts.cached(topic)
+    if hit is not MISS:
+        return hit
+    return await asyncio.get_running_loop().run_in_executor(get_executor("default"), facts.lookup, topic)
+
+@tool("db_stats")
+def db_stats():
+    return facts.stats()
 
 @app.get("/health")
 def health():
-    return {"status":"ok","tools":["query_db"]}
+    return {"status":"ok","tools":["query_db","db_stats"]}
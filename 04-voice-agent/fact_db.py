@@ -0,0 +1,149 @@
+
+"""
+Fact lookups for the voice agent: pooled read-only SQLite connections (WAL), exact
+topic match, then ranked FTS5 search over topic/content, then a typo-tolerant match
+against known topics. Answers for normalized topics are kept in a small hot cache.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+import difflib, queue, re, sqlite3, threading, time
+from common.mcp_core.cache import MISS, ToolCache
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+# Filler in spoken questions; matching on these (or on 1-2 letter prefixes) hits almost every fact.
+_STOPWORDS = frozenset("""
+a about an and are as at be been can could did do does for from had has have how i in is it its me my of on or
+please say should tell than that the their them then there these they this to up us was we were what when where
+which who whom why will with would you your know explain define give some any just like
+""".split())
+
+def search_terms(key: str) -> List[str]:
+    """Words of a normalized topic worth searching for: no stopwords, at least three characters."""
+    return list(dict.fromkeys(t for t in key.split() if len(t) > 2 and t not in _STOPWORDS))
+
+def normalize(topic: str) -> str:
+    """Lowercase, drop punctuation and filler whitespace from a transcribed topic."""
+    return " ".join(_WORD.findall(topic.lower()))
+
+def init_db(path: str, seed: Optional[List[tuple]] = None):
+    """Create ``facts`` (if missing), switch the file to WAL and keep an FTS5 index in sync via triggers."""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        created = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'facts'").fetchone() is None
+        if created:
+            conn.execute("CREATE TABLE facts (id INTEGER PRIMARY KEY, topic TEXT, content TEXT)")
+            conn.executemany("INSERT INTO facts(topic,content) VALUES(?,?)", seed or [])
+        conn.execute("CREATE INDEX IF NOT EXISTS facts_topic ON facts(topic COLLATE NOCASE)")
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'facts_fts'").fetchone() is None:
+            conn.executescript("""
+                CREATE VIRTUAL TABLE facts_fts USING fts5(topic, content, content='facts', content_rowid='id',
+                                                          tokenize='porter unicode61');
+                CREATE TRIGGER facts_ai AFTER INSERT ON facts BEGIN
+                  INSERT INTO facts_fts(rowid, topic, content) VALUES (new.id, new.topic, new.content);
+                END;
+                CREATE TRIGGER facts_ad AFTER DELETE ON facts BEGIN
+                  INSERT INTO facts_fts(facts_fts, rowid, topic, content) VALUES ('delete', old.id, old.topic, old.content);
+                END;
+                CREATE TRIGGER facts_au AFTER UPDATE ON facts BEGIN
+                  INSERT INTO facts_fts(facts_fts, rowid, topic, content) VALUES ('delete', old.id, old.topic, old.content);
+                  INSERT INTO facts_fts(rowid, topic, content) VALUES (new.id, new.topic, new.content);
+                END;
+                INSERT INTO facts_fts(facts_fts) VALUES ('rebuild');
+            """)
+        conn.commit()
+    finally:
+        conn.close()
+
+class ReadPool:
+    """Fixed pool of read-only connections shared across tool threads."""
+    def __init__(self, path: str, size: int = 4):
+        self._idle: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(size):
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute("PRAGMA query_only=1")
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+class FactDB:
+    def __init__(self, path: str, pool_size: int = 4, cache_ttl: float = 60.0, cache_entries: int = 2048,
+                 fuzzy_cutoff: float = 0.75, fts_min_coverage: float = 0.5):
+        self.pool = ReadPool(path, pool_size)
+        # Hot answers keyed by normalized topic; the TTL bounds staleness after external writes.
+        self.hot = ToolCache(ttl=cache_ttl, max_entries=cache_entries, max_bytes=4 * 1024 * 1024)
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.fts_min_coverage = fts_min_coverage  # share of search terms an FTS hit must contain
+        self._topics: Dict[str, str] = {}
+        self._topics_at = 0.0
+        self._topics_lock = threading.Lock()
+        self.modes: Dict[str, int] = {}
+
+    def cached(self, topic: str) -> Any:
+        """Hot-cache probe only (no SQLite); returns ``MISS`` when absent."""
+        return self.hot.get(normalize(topic))
+
+    def lookup(self, topic: str) -> Dict[str, Any]:
+        """Query SQLite (exact, FTS5, fuzzy) and remember the answer; call after a ``cached`` miss."""
+        key = normalize(topic)
+        res = self._lookup(key) if key else None
+        res = res or {"answer": "No local fact found. You may fall back to web search.", "mode": "fallback"}
+        with self._topics_lock:
+            self.modes[res["mode"]] = self.modes.get(res["mode"], 0) + 1
+        self.hot.put(key, res)
+        return res
+
+    def get(self, topic: str) -> Dict[str, Any]:
+        hit = self.cached(topic)
+        return hit if hit is not MISS else self.lookup(topic)
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT topic, content FROM facts WHERE topic = ? COLLATE NOCASE", (key,)).fetchone()
+            if row:
+                return {"answer": row[1], "mode": "db", "topic": row[0]}
+            hit = self._fts(conn, search_terms(key))
+            if hit:
+                return hit
+            topics = self._known_topics(conn)  # this snapshot, not self._topics: a refresh may swap it
+            close = difflib.get_close_matches(key, list(topics), n=1, cutoff=self.fuzzy_cutoff)
+            if close:
+                topic = topics[close[0]]
+                row = conn.execute("SELECT content FROM facts WHERE topic = ?", (topic,)).fetchone()
+                if row:
+                    return {"answer": row[0], "mode": "fuzzy", "topic": topic}
+        return None
+
+    def _fts(self, conn: sqlite3.Connection, terms: List[str], candidates: int = 5) -> Optional[Dict[str, Any]]:
+        """Best-ranked fact containing at least ``fts_min_coverage`` of ``terms``."""
+        if not terms:
+            return None
+        # Any term may match (prefix match absorbs truncated words); topic hits weigh 5x content hits.
+        match = " OR ".join(f'"{t}"*' for t in terms)
+        rows = conn.execute("SELECT f.id, f.topic, f.content, bm25(facts_fts, 5.0, 1.0) AS score FROM facts_fts "
+                            "JOIN facts f ON f.id = facts_fts.rowid WHERE facts_fts MATCH ? "
+                            "ORDER BY score LIMIT ?", (match, candidates)).fetchall()
+        for rowid, topic, content, score in rows:
+            matched = sum(conn.execute("SELECT 1 FROM facts_fts WHERE facts_fts MATCH ? AND rowid = ?",
+                                       (f'"{t}"*', rowid)).fetchone() is not None for t in terms)
+            if matched / len(terms) >= self.fts_min_coverage:
+                return {"answer": content, "mode": "fts", "topic": topic, "score": round(-score, 4),
+                        "coverage": round(matched / len(terms), 2)}
+        return None
+
+    def _known_topics(self, conn: sqlite3.Connection, max_age: float = 30.0) -> Dict[str, str]:
+        with self._topics_lock:  # also guards ``modes``
+            if time.monotonic() - self._topics_at > max_age:
+                self._topics = {normalize(t): t for (t,) in conn.execute("SELECT DISTINCT topic FROM facts")}
+                self._topics_at = time.monotonic()
+            return self._topics
+
+    def stats(self) -> Dict[str, Any]:
+        return {"cache": self.hot.stats(), "modes": dict(self.modes)}
@@ -1,31 +1,145 @@
 
 from common.mcp_core.server import app as base_app
-from common.mcp_core.tools import tool
-import duckdb, pandas as pd, os
+from common.mcp_core.tools import tool, ToolBusyError
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from common.mcp_core.cache import MISS
+from duck import Catalog, CursorRegistry, QueryCache, SessionPool, jsonable, limited
+import io, os
 
 app = base_app
 os.makedirs("data", exist_ok=True)
 
+# Sessions are initialized once and reused; files in ./data are exposed as views.
+pool = SessionPool(size=int(os.getenv("DUCKDB_POOL", "4")), timeout=float(os.getenv("DUCKDB_SESSION_TIMEOUT", "10")))
+catalog = Catalog(pool, "data")
+cursors = CursorRegistry(pool, ttl=float(os.getenv("DUCKDB_CURSOR_TTL", "300")),
+                         max_open=int(os.getenv("DUCKDB_MAX_CURSORS", "32")))
+results = QueryCache(catalog, max_bytes=int(os.getenv("DUCKDB_CACHE_MB", "64")) * 1024 * 1024)
+
+HINT = "Use DuckDB SQL and reference local files in ./data, e.g., read_csv('data/*.csv'), or a view from list_sources"
+
 @tool("list_sources")
 def list_sources():
-    files = [f for f in os.listdir("data") if f.endswith((".csv",".parquet",".json"))]
-    return {"files": files}
+    sources = catalog.list()
+    return {"files": [os.path.basename(s["file"]) for s in sources], "sources": sources}
 
 @tool("query")
-def query(sql: str):
-    # Expose DuckDB with access to ./data directory (CSV/JSON/Parquet)
-    con = duckdb.connect(database=':memory:')
-    con.execute("INSTALL httpfs; LOAD httpfs;")
-    con.execute("SET home_directory='.';")
-    con.execute("SET timezone='UTC';")
-    con.execute("CREATE SECRET secret(type 'S3', key_id '', secret '', session_token '');")  # no-op demo
-    # DuckDB can read local files with glob patterns
+def query(sql: str, limit: int = 20):
+    catalog.refresh()
+    # Results are cached per normalized SQL + (path, size, mtime) of every file it reads,
+    # so a repeated query is answered without a rescan until one of those files changes.
+    key = results.key(sql, limit)
+    hit = results.get(key)
+    if hit is not MISS:
+        return hit
+    # DuckDB can read local files with glob patterns, or the catalog views (see list_sources).
+    # The limit is pushed into the plan (one extra row tells whether the result was cut),
+    # so only the rows returned are ever produced.
+    try:
+        with pool.for_statement(sql) as con:
+            cur = con.execute(limited(sql, limit + 1))
+            columns = [d[0] for d in cur.description or []]
+            rows = cur.fetchmany(limit + 1) if cur.description else []
+    except ToolBusyError:
+        raise
+    except Exception as e:
+        return {"error": str(e), "hint": HINT}
+    res = {"columns": columns, "rows": min(len(rows), limit), "has_more": len(rows) > limit,
+           "data": [dict(zip(columns, r)) for r in jsonable(rows[:limit])]}
+    results.put(key, res)
+    return res
+
+@tool("cache_stats")
+def cache_stats():
+    return {"query": results.stats(), "cursors": cursors.stats(), "catalog_version": catalog.version}
+
+@tool("query_cursor")
+def query_cursor(sql: str, page_size: int = 1000):
+    # Opens a server-side cursor and returns its first page; continue with fetch_page.
+    catalog.refresh()
+    try:
+        cid, _ = cursors.open(sql)
+    except Exception as e:
+        return {"error": str(e), "hint": HINT}
+    return cursors.fetch(cid, page_size)
+
+@tool("fetch_page")
+def fetch_page(cursor: str, page_size: int = 1000):
+    try:
+        return cursors.fetch(cursor, page_size)
+    except KeyError as e:
+        return {"error": e.args[0]}
+
+@tool("close_cursor")
+def close_cursor(cursor: str):
+    return {"closed": cursors.close(cursor), "cursors": cursors.stats()}
+
+@tool("query_stream")
+def query_stream(sql: str, batch_size: int = 1000):
+    # Streams {"columns": [...]} then {"rows": [...]} batches; use via POST /rpc/stream.
+    # The client sets the pace, so this runs on its own session rather than holding a pooled one.
+    catalog.refresh()
+    con = pool.open_for(sql)
+    try:
+        cur = con.execute(sql)
+        yield {"columns": [d[0] for d in cur.description]}
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield {"rows": jsonable(rows)}
+    finally:
+        con.close()
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+def _arrow_batches(reader):
+    import pyarrow as pa
+    buf = io.BytesIO()
+    with pa.ipc.new_stream(buf, reader.schema) as writer:
+        yield _drain(buf)  # schema message
+        for batch in reader:
+            writer.write_batch(batch)
+            yield _drain(buf)
+    yield _drain(buf)  # end-of-stream marker
+
+def _drain(buf: io.BytesIO) -> bytes:
+    data = buf.getvalue()
+    buf.seek(0)
+    buf.truncate()
+    return data
+
+def _open_arrow(sql: str, batch_size: int):
+    catalog.refresh()
+    con = pool.open_for(sql)
     try:
-        df = con.execute(sql).fetchdf()
-        return {"rows": len(df), "data": df.head(20).to_dict(orient="records")}
+        res = con.execute(sql)
+        reader = res.to_arrow_reader(batch_size) if hasattr(res, "to_arrow_reader") else res.fetch_record_batch(batch_size)
+    except Exception:
+        con.close()
+        raise
+    return con, reader
+
+@app.post("/query/arrow")
+async def query_arrow(request: Request):
+    """Run ``{"sql", "batch_size"}`` and stream the result as Arrow IPC record batches,
+    straight from DuckDB's columnar output with no per-row conversion."""
+    body = await request.json()
+    try:
+        # Planning and the first pipeline step run off the event loop; errors still get a JSON 400.
+        con, reader = await run_in_threadpool(_open_arrow, body["sql"], int(body.get("batch_size", 65536)))
     except Exception as e:
-        return {"error": str(e), "hint": "Use DuckDB SQL and reference local files in ./data, e.g., read_csv('data/*.csv')"}
+        return JSONResponse({"error": str(e), "hint": HINT}, status_code=400)
+
+    def stream():
+        try:
+            yield from _arrow_batches(reader)
+        finally:
+            con.close()
+    return StreamingResponse(stream(), media_type=ARROW_STREAM)
 
 @app.get("/health")
 def health():
-    return {"status":"ok","tools":["list_sources","query"]}
+    return {"status":"ok","tools":["list_sources","query","cache_stats","query_cursor","fetch_page","close_cursor","query_stream"]}
@@ -0,0 +1,465 @@
+
+"""
+DuckDB plumbing for the unified server: one in-process database with a pool of
+pre-initialized sessions, and a catalog that exposes every file in ./data as a view.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+import glob, json, logging, os, queue, re, threading, time, uuid
+import duckdb
+from common.mcp_core.cache import MISS, ToolCache
+from common.mcp_core.tools import ToolBusyError
+
+log = logging.getLogger(__name__)
+
+READERS = {".csv": "read_csv_auto", ".parquet": "read_parquet", ".json": "read_json_auto"}
+
+class SessionPool:
+    """``size`` DuckDB sessions (cursors) over one in-memory database.
+
+    Extensions, secrets and settings are applied once per database / session instead of
+    on every query; views created by the catalog are visible to every session. Pooled
+    sessions only run single read statements (see ``statement_kind``); anything else runs
+    in an ``isolated`` database, so no caller can leave settings, tables or views behind
+    for the next one. ``session`` waits at most ``timeout`` seconds for a free session,
+    then raises ``ToolBusyError``.
+    """
+    def __init__(self, size: int = 4, home: str = ".", timeout: float = 10.0):
+        self.db = duckdb.connect(database=":memory:")
+        self.httpfs = self._load_httpfs(self.db)
+        self.views: Dict[str, str] = {}  # catalog view -> its SELECT, replayed into isolated databases
+        self._idle: "queue.Queue[duckdb.DuckDBPyConnection]" = queue.Queue()
+        self.size = size
+        self.timeout = timeout
+        self.home = home
+        for _ in range(size):
+            self._idle.put(self._init(self.db.cursor()))
+
+    def _init(self, cur: duckdb.DuckDBPyConnection) -> duckdb.DuckDBPyConnection:
+        """Settings every session gets, pooled or dedicated."""
+        cur.execute(f"SET home_directory={_quote(self.home)};")
+        cur.execute("SET timezone='UTC';")
+        return cur
+
+    def _load_httpfs(self, db: duckdb.DuckDBPyConnection) -> bool:
+        try:
+            db.execute("INSTALL httpfs; LOAD httpfs;")
+            db.execute("CREATE SECRET secret(type 'S3', key_id '', secret '', session_token '');")  # no-op demo
+            return True
+        except duckdb.Error as e:
+            # Offline / no extension repository: local files still work, remote URLs will not.
+            log.warning("httpfs unavailable, remote sources disabled: %s", e)
+            return False
+
+    @contextmanager
+    def session(self, timeout: Optional[float] = None):
+        try:
+            cur = self._idle.get(timeout=self.timeout if timeout is None else timeout)
+        except queue.Empty:
+            raise ToolBusyError(f"All {self.size} DuckDB sessions are busy") from None
+        try:
+            yield cur
+        finally:
+            self._idle.put(cur)
+
+    @contextmanager
+    def for_statement(self, sql: str):
+        """A pooled session for a single read, else an isolated database closed afterwards."""
+        if statement_kind(sql) == "read":
+            with self.session() as cur:
+                yield cur
+            return
+        con = self.isolated()
+        try:
+            yield con
+        finally:
+            con.close()
+
+    def open_for(self, sql: str) -> duckdb.DuckDBPyConnection:
+        """A session the caller keeps (cursors, streams, exports) and closes: a dedicated one
+        for a single read, else an isolated database."""
+        return self.dedicated() if statement_kind(sql) == "read" else self.isolated()
+
+    def dedicated(self) -> duckdb.DuckDBPyConnection:
+        """A new initialized session outside the pool, for long-lived cursors and exports.
+        The caller closes it."""
+        return self._init(self.db.cursor())
+
+    def isolated(self) -> duckdb.DuckDBPyConnection:
+        """A separate in-memory database with the same settings and catalog views, for
+        statements that may create or replace objects: nothing they do outlives it."""
+        db = duckdb.connect(database=":memory:")
+        try:
+            if self.httpfs:
+                self._load_httpfs(db)
+            self._init(db)
+            for view, select in list(self.views.items()):
+                try:
+                    db.execute(f'CREATE VIEW "{view}" AS {select}')
+                except duckdb.Error:
+                    pass  # the file changed under us; the catalog re-registers it on its next refresh
+        except BaseException:
+            db.close()
+            raise
+        return db
+
+# Statements that reach outside the database they run in (other database files, the extension directory).
+_GLOBAL = {"ATTACH", "DETACH", "LOAD", "EXTENSION"}
+
+def statement_kind(sql: str) -> str:
+    """``"read"`` for one SELECT-like statement (safe on a pooled session), ``"other"`` for
+    anything else (run it in an isolated database). Raises ``ValueError`` for statements that
+    reach outside the database (ATTACH, DETACH, INSTALL/LOAD)."""
+    try:
+        stmts = duckdb.extract_statements(sql)
+    except duckdb.Error:
+        return "other"  # let execution report the syntax error
+    for st in stmts:
+        if st.type.name in _GLOBAL:
+            raise ValueError(f"{st.type.name} statements are not allowed")
+    return "read" if len(stmts) == 1 and stmts[0].type.name == "SELECT" else "other"
+
+_SELECT = re.compile(r"^\s*(?:--[^\n]*\n\s*|/\*.*?\*/\s*)*(select|with|from|values|table)\b", re.I | re.S)
+
+def limited(sql: str, limit: int) -> str:
+    """Wrap a single SELECT so DuckDB plans it with ``LIMIT`` (top-N sorts, early scan exit).
+    Anything else (several statements, DDL, unparsable input) is returned unchanged; the
+    caller still fetches at most ``limit`` rows."""
+    try:
+        stmts = duckdb.extract_statements(sql)
+    except duckdb.Error:
+        return sql
+    if len(stmts) != 1 or stmts[0].type.name != "SELECT":
+        return sql
+    body = _strip_tail(stmts[0].query)
+    return f"SELECT * FROM (\n{body}\n) AS _q LIMIT {int(limit)}" if body else sql
+
+def jsonable(rows: List[tuple]) -> List[list]:
+    return [[v if isinstance(v, (int, float, str, bool, type(None))) else str(v) for v in r] for r in rows]
+
+class CursorRegistry:
+    """Server-side cursors: an executing query on a dedicated session, read page by page.
+
+    Cursors idle for ``ttl`` seconds are closed; beyond ``max_open`` the least recently
+    used one is closed to make room.
+    """
+    def __init__(self, pool: SessionPool, ttl: float = 300.0, max_open: int = 32):
+        self.pool = pool
+        self.ttl = ttl
+        self.max_open = max_open
+        self._open: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def open(self, sql: str) -> Tuple[str, List[str]]:
+        self._expire()
+        con = self.pool.open_for(sql)
+        try:
+            con.execute(sql)
+        except Exception:
+            con.close()
+            raise
+        columns = [d[0] for d in con.description or []]
+        cid = uuid.uuid4().hex
+        with self._lock:
+            while len(self._open) >= self.max_open:
+                oldest = min(self._open, key=lambda k: self._open[k]["used"])
+                self._close(oldest)
+            self._open[cid] = {"con": con, "columns": columns, "offset": 0, "peek": [],
+                               "used": time.monotonic(), "lock": threading.Lock()}
+        return cid, columns
+
+    def fetch(self, cid: str, size: int) -> Dict[str, Any]:
+        """Next ``size`` rows; the page carries ``cursor`` while more rows remain, and the
+        cursor is closed once the result is exhausted."""
+        size = max(int(size), 1)
+        with self._lock:
+            c = self._open.get(cid)
+        if c is None:
+            raise KeyError(f"Unknown or expired cursor '{cid}'")
+        with c["lock"]:
+            # One row of look-ahead tells whether another page exists without a round trip.
+            rows = c["peek"] + c["con"].fetchmany(size + 1 - len(c["peek"]))
+            more = len(rows) > size
+            rows, c["peek"] = rows[:size], rows[size:]
+            offset = c["offset"]
+            c["offset"] += len(rows)
+            c["used"] = time.monotonic()
+        page = {"columns": c["columns"], "offset": offset, "rows": len(rows), "data": jsonable(rows)}
+        if more:
+            page["cursor"] = cid
+        else:
+            self.close(cid)
+        return page
+
+    def close(self, cid: str) -> bool:
+        with self._lock:
+            return self._close(cid)
+
+    def _close(self, cid: str) -> bool:
+        c = self._open.pop(cid, None)
+        if c is not None:
+            c["con"].close()
+        return c is not None
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._lock:
+            for cid in [k for k, c in self._open.items() if now - c["used"] > self.ttl]:
+                self._close(cid)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"open": len(self._open), "max_open": self.max_open, "ttl": self.ttl}
+
+def view_name(filename: str, taken: Dict[str, str]) -> str:
+    stem, ext = os.path.splitext(filename)
+    name = re.sub(r"\W+", "_", stem).strip("_").lower() or "source"
+    if name[0].isdigit():
+        name = f"t_{name}"
+    if taken.get(name, filename) != filename:
+        name = f"{name}_{ext.lstrip('.')}"
+    return name
+
+class Catalog:
+    """Views over ./data files, re-registered when a file's size or mtime changes."""
+    def __init__(self, pool: SessionPool, root: str = "data", min_interval: float = 1.0):
+        self.pool = pool
+        self.root = root
+        self.min_interval = min_interval
+        self.sources: Dict[str, Dict[str, Any]] = {}  # file name -> entry
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.version = 0  # bumped on every catalog change
+
+    def _scan(self) -> Dict[str, Tuple[int, float]]:
+        out = {}
+        with os.scandir(self.root) as it:
+            for e in it:
+                if e.is_file() and os.path.splitext(e.name)[1].lower() in READERS:
+                    st = e.stat()
+                    out[e.name] = (st.st_size, st.st_mtime)
+        return out
+
+    def refresh(self, force: bool = False) -> bool:
+        """Sync views with the directory; cheap (one scandir) when nothing changed."""
+        if not force and time.monotonic() - self._checked < self.min_interval:
+            return False
+        with self._lock:
+            self._checked = time.monotonic()
+            files = self._scan()
+            changed = False
+            for name in [n for n in self.sources if n not in files]:
+                self._drop(self.sources.pop(name))
+                changed = True
+            taken = {e["view"]: n for n, e in self.sources.items()}
+            for name, (size, mtime) in sorted(files.items()):
+                entry = self.sources.get(name)
+                if entry and (entry["size"], entry["mtime"]) == (size, mtime):
+                    continue
+                view = entry["view"] if entry else view_name(name, taken)
+                taken[view] = name
+                self.sources[name] = self._register(name, view, size, mtime)
+                changed = True
+            if changed:
+                self.version += 1
+            return changed
+
+    def _register(self, name: str, view: str, size: int, mtime: float) -> Dict[str, Any]:
+        path = os.path.join(self.root, name)
+        reader = READERS[os.path.splitext(name)[1].lower()]
+        entry = {"view": view, "file": path, "format": reader.split("_")[1], "size": size, "mtime": mtime}
+        select = f"SELECT * FROM {reader}({_quote(path)})"
+        with self.pool.session() as cur:
+            try:
+                cur.execute(f'CREATE OR REPLACE VIEW "{view}" AS {select}')
+                entry["columns"] = [{"name": r[0], "type": r[1]} for r in cur.execute(f'DESCRIBE "{view}"').fetchall()]
+                entry["rows"] = cur.execute(f'SELECT count(*) FROM "{view}"').fetchone()[0]
+                self.pool.views[view] = select
+            except duckdb.Error as e:
+                entry["error"] = str(e)
+                self.pool.views.pop(view, None)
+        return entry
+
+    def _drop(self, entry: Dict[str, Any]):
+        self.pool.views.pop(entry["view"], None)
+        with self.pool.session() as cur:
+            cur.execute(f'DROP VIEW IF EXISTS "{entry["view"]}"')
+
+    def list(self) -> List[Dict[str, Any]]:
+        self.refresh()
+        with self._lock:
+            return [dict(e) for _, e in sorted(self.sources.items())]
+
+_TOKEN = re.compile(r"('(?:[^']|'')*')|(\"(?:[^\"]|\"\")*\")|(--[^\n]*|/\*.*?\*/)|(\s+)|([^'\"\s/;-]+|.)", re.S)
+_IDENT = re.compile(r"[a-z_][a-z0-9_]*")
+# Functions whose result changes between runs: such queries are never cached.
+_VOLATILE = {"random", "uuid", "gen_random_uuid", "now", "current_timestamp", "current_date", "current_time",
+             "get_current_timestamp", "today", "setseed", "nextval", "currval"}
+
+def parse_sql(sql: str) -> Tuple[str, List[str], List[str]]:
+    """``(normalized sql, identifiers, string literals)``.
+
+    Normalization drops comments and the trailing ``;``, collapses whitespace and
+    lowercases everything outside quotes (DuckDB identifiers are case-insensitive).
+    """
+    out, idents, literals = [], [], []
+    for lit, quoted, comment, space, other in _TOKEN.findall(sql):
+        if lit:
+            literals.append(lit[1:-1].replace("''", "'"))
+            out.append(lit)
+        elif quoted:
+            idents.append(quoted[1:-1].replace('""', '"').lower())
+            out.append(quoted)
+        elif comment or space:
+            if out and out[-1] != " ":
+                out.append(" ")
+        else:
+            other = other.lower()
+            idents.extend(_IDENT.findall(other))
+            out.append(other)
+    norm = "".join(out).strip()
+    while norm.endswith(";"):
+        norm = norm[:-1].rstrip()
+    return norm, idents, literals
+
+# Table functions a cacheable query may use: file readers (their path arguments are
+# fingerprinted) and generators whose output depends only on their arguments.
+_READ_FUNCS = {"read_csv", "read_csv_auto", "read_parquet", "parquet_scan", "read_json", "read_json_auto",
+               "read_ndjson", "read_ndjson_auto", "read_json_objects", "read_text", "read_blob"}
+_PURE_FUNCS = {"range", "generate_series", "unnest"}
+
+def _walk(node: Any, cte: set, tables: List[str], funcs: List[Tuple[str, List[str]]]):
+    """Collect base-table names (minus CTEs) and table functions with their string arguments
+    from a ``json_serialize_sql`` tree."""
+    if isinstance(node, list):
+        for n in node:
+            _walk(n, cte, tables, funcs)
+        return
+    if not isinstance(node, dict):
+        return
+    for entry in (node.get("cte_map") or {}).get("map", []):
+        cte.add(entry["key"].lower())
+    if node.get("type") == "BASE_TABLE":
+        if node.get("schema_name") or node.get("catalog_name"):
+            tables.append(f'{node.get("catalog_name") or ""}.{node["schema_name"]}.{node["table_name"]}')  # never a file
+        elif node["table_name"].lower() not in cte:
+            tables.append(node["table_name"])
+    elif node.get("type") == "TABLE_FUNCTION":
+        fn = node["function"]
+        args: List[str] = []
+        _strings(fn.get("children", []), args)
+        funcs.append((fn["function_name"].lower(), args))
+    for v in node.values():
+        _walk(v, cte, tables, funcs)
+
+def _strings(node: Any, out: List[str]):
+    if isinstance(node, list):
+        for n in node:
+            _strings(n, out)
+    elif isinstance(node, dict):
+        val = node.get("value")
+        if node.get("type") == "VALUE_CONSTANT" and isinstance(val, dict) and val.get("type", {}).get("id") == "VARCHAR":
+            out.append(val["value"])
+        for v in node.values():
+            _strings(v, out)
+
+def _strip_tail(sql: str) -> str:
+    """``sql`` without trailing semicolons, comments and whitespace (quotes are respected)."""
+    end = 0
+    for m in _TOKEN.finditer(sql):
+        lit, quoted, comment, space, other = m.groups()
+        if lit or quoted or (other and other != ";"):
+            end = m.end()
+    return sql[:end]
+
+class QueryCache:
+    """Results keyed by normalized SQL plus a fingerprint of every file the query reads.
+
+    DuckDB parses the query and every relation it names must be accounted for: a catalog
+    view, a file path or glob used as a table (``FROM "data/sales.json"``), or a reader
+    function over paths (``read_csv('data/*.csv')``). Each file contributes (path, size,
+    mtime), so an edited, added or removed file changes the key and the old entry simply
+    ages out of the LRU. Anything else (other tables or views, remote URLs, volatile
+    functions, several statements, non-reads) bypasses the cache.
+    """
+    def __init__(self, catalog: Catalog, max_bytes: int = 64 * 1024 * 1024, max_entries: int = 4096):
+        self.catalog = catalog
+        self.results = ToolCache(ttl=None, max_entries=max_entries, max_bytes=max_bytes)
+        self.bypassed = 0
+        # Parsing only: a private session, so cache lookups never wait for a pooled one.
+        self._parser = catalog.pool.dedicated()
+        self._parser_lock = threading.Lock()
+
+    def _relations(self, sql: str) -> Optional[Tuple[List[str], List[Tuple[str, List[str]]]]]:
+        with self._parser_lock:
+            try:
+                tree = json.loads(self._parser.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0])
+            except duckdb.Error:
+                return None
+        if tree.get("error") or len(tree.get("statements", [])) != 1:
+            return None
+        tables: List[str] = []
+        funcs: List[Tuple[str, List[str]]] = []
+        _walk(tree["statements"][0], set(), tables, funcs)
+        return tables, funcs
+
+    def _paths(self, spec: str) -> Optional[List[str]]:
+        """Files a path or glob stands for (plus a marker for the glob itself), or None if it is not local."""
+        if "://" in spec:
+            return None
+        if glob.has_magic(spec):
+            return [*glob.glob(spec, recursive=True), f"glob:{spec}"]  # a glob matching nothing yet still gets its own key
+        return [spec] if os.path.isfile(spec) else None
+
+    def key(self, sql: str, *params: Any) -> Optional[str]:
+        """Cache key for ``sql`` (and extra result-shaping params), or None if uncacheable."""
+        norm, idents, _ = parse_sql(sql)
+        if not _SELECT.match(norm) or _VOLATILE.intersection(idents):
+            return None
+        rels = self._relations(sql)
+        if rels is None:
+            return None
+        tables, funcs = rels
+        views = {e["view"]: e["file"] for e in list(self.catalog.sources.values())}
+        files = set()
+        for name in tables:
+            found = [views[name.lower()]] if name.lower() in views else self._paths(name)
+            if found is None:
+                return None  # a table or view we cannot fingerprint
+            files.update(found)
+        for fn, args in funcs:
+            if fn in _READ_FUNCS:
+                for arg in args:
+                    found = self._paths(arg)
+                    if found is None:
+                        return None
+                    files.update(found)
+            elif fn not in _PURE_FUNCS:
+                return None
+        prints = []
+        for f in sorted(files):
+            try:
+                st = os.stat(f)
+                prints.append(f"{os.path.abspath(f)}:{st.st_size}:{st.st_mtime_ns}")
+            except OSError:
+                prints.append(f)
+        return "\x00".join([norm, repr(params), *prints])
+
+    def get(self, key: Optional[str]) -> Any:
+        if key is None:
+            self.bypassed += 1
+            return MISS
+        return self.results.get(key)
+
+    def put(self, key: Optional[str], value: Any):
+        if key is not None:
+            self.results.put(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        st = self.results.stats()
+        return {k: st[k] for k in ("hits", "misses", "evictions", "entries", "bytes")} | {
+            "bypassed": self.bypassed, "max_bytes": self.results.max_bytes}
+
+def _quote(s: str) -> str:
+    return "'" + s.replace("'", "''") + "'"
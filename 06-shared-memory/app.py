@@ -1,46 +1,114 @@
 
 from common.mcp_core.server import app as base_app
-from common.mcp_core.tools import tool
-import sqlite3, os, time
+from common.mcp_core.tools import tool, get_executor
+from kv_store import KVStore
+from typing import Dict, List, Optional
+import asyncio, os, time
 
 DB = "shared_memory.db"
-conn = sqlite3.connect(DB)
-c = conn.cursor()
-c.execute("CREATE TABLE IF NOT EXISTS kv(namespace TEXT, k TEXT, v TEXT, ts REAL, PRIMARY KEY(namespace,k))")
-conn.commit()
-conn.close()
+# Persistent WAL connections plus a write-through read cache. Setting MEM_GROUP_COMMIT_MS (0 or more)
+# batches concurrent single puts into one transaction; each put still returns only once committed.
+store = KVStore(DB, readers=int(os.getenv("MEM_READERS", "4")),
+                cache_entries=int(os.getenv("MEM_CACHE_ENTRIES", "10000")),
+                group_window=float(os.environ["MEM_GROUP_COMMIT_MS"]) / 1000 if "MEM_GROUP_COMMIT_MS" in os.environ else None,
+                synchronous=os.getenv("MEM_SYNCHRONOUS", "NORMAL"),
+                external_check=float(os.getenv("MEM_EXTERNAL_CHECK_MS", "50")) / 1000)
 
 app = base_app
 
+# Watchers wake on every write made through this server; writes by other processes are
+# picked up by re-checking at this interval.
+WATCH_POLL = float(os.getenv("MEM_WATCH_POLL", "1.0"))
+
+def _items(rows):
+    return [{"key":k, "value":v, "ts":ts, "version":ver} for (k,v,ts,ver) in rows]
+
 @tool("mem_put")
 def mem_put(namespace: str, key: str, value: str):
-    conn = sqlite3.connect(DB)
-    c = conn.cursor()
-    c.execute("INSERT OR REPLACE INTO kv(namespace,k,v,ts) VALUES(?,?,?,?)", (namespace, key, value, time.time()))
-    conn.commit()
-    conn.close()
-    return {"ok": True}
+    return {"ok": True, "version": store.put(namespace, key, value)}
+
+@tool("mem_put_many")
+def mem_put_many(namespace: str, items: Dict[str, str]):
+    # All keys are written in one transaction: either every item is stored or none is.
+    return {"ok": True, "count": len(items), "version": store.put_many(namespace, items)}
 
 @tool("mem_get")
 def mem_get(namespace: str, key: str):
-    conn = sqlite3.connect(DB)
-    c = conn.cursor()
-    c.execute("SELECT v, ts FROM kv WHERE namespace=? AND k=?", (namespace, key))
-    row = c.fetchone()
-    conn.close()
+    row = store.get(namespace, key)
     if not row:
         return {"found": False}
-    return {"found": True, "value": row[0], "ts": row[1]}
+    return {"found": True, "value": row[0], "ts": row[1], "version": row[2]}
+
+@tool("mem_get_many")
+def mem_get_many(namespace: str, keys: List[str]):
+    found = store.get_many(namespace, keys)
+    return {"items": {k: {"value": v, "ts": ts, "version": ver} for k, (v, ts, ver) in found.items()},
+            "missing": [k for k in dict.fromkeys(keys) if k not in found]}
 
 @tool("mem_list")
-def mem_list(namespace: str):
-    conn = sqlite3.connect(DB)
-    c = conn.cursor()
-    c.execute("SELECT k, v, ts FROM kv WHERE namespace=?", (namespace,))
-    rows = [{"key":k, "value":v, "ts":ts} for (k,v,ts) in c.fetchall()]
-    conn.close()
-    return {"items": rows}
+def mem_list(namespace: str, prefix: str = "", since_version: Optional[int] = None,
+             limit: Optional[int] = None, cursor: Optional[str] = None):
+    # Without since_version: keys in key order. With it: only keys written after that version,
+    # oldest change first. "version" is the store version the listing reflects; pass it as
+    # since_version next time (or to mem_watch) to get only what changed. When more rows
+    # than ``limit`` match, "cursor" is returned; repeat the same call with it for the next page.
+    # The cursor carries the version read by the first page, and every page returns that version:
+    # a key rewritten after its page was read has a newer version, so the next delta still sees it.
+    limit = None if limit is None else max(int(limit), 1)
+    pinned, pos = None, None
+    if cursor:
+        pinned, pos = cursor[2:].split(":", 1)
+        pinned = int(pinned)
+    if since_version is None:
+        rows, version = store.list(namespace, prefix, pos, None if limit is None else limit + 1)
+        nxt = lambda r: r[0]
+    else:
+        since = int(pos) if pos is not None else since_version
+        rows, version = store.changes(namespace, prefix, since, None if limit is None else limit + 1)
+        nxt = lambda r: str(r[3])
+    version = version if pinned is None else pinned
+    res = {"items": _items(rows[:limit]), "version": version}
+    if limit is not None and len(rows) > limit:
+        res["cursor"] = f"{'k' if since_version is None else 'v'}:{version}:{nxt(rows[limit - 1])}"
+    return res
+
+async def _changes(namespace: str, prefix: str, since: int, limit: int):
+    return await asyncio.get_running_loop().run_in_executor(get_executor("default"), store.changes,
+                                                            namespace, prefix, since, limit)
+
+@tool("mem_watch")
+async def mem_watch(namespace: str, prefix: str = "", since_version: int = 0, timeout: float = 25.0,
+                    limit: int = 1000):
+    # Long-poll: returns as soon as some key under namespace/prefix has a version > since_version,
+    # or with no items once ``timeout`` seconds pass. Continue from the returned "version".
+    deadline = time.monotonic() + timeout
+    while True:
+        rows, version = await _changes(namespace, prefix, since_version, limit)
+        left = deadline - time.monotonic()
+        if rows or left <= 0:
+            # With a full page, resume after its last row rather than the store version.
+            return {"items": _items(rows), "version": rows[-1][3] if len(rows) == limit else version}
+        await store.wait(version, min(left, WATCH_POLL))
+
+@tool("mem_subscribe")
+async def mem_subscribe(namespace: str, prefix: str = "", since_version: Optional[int] = None,
+                        limit: int = 1000):
+    # Streaming tool (POST /rpc/stream, Accept: text/event-stream for SSE): one message per
+    # batch of changes, each with the "version" to resume from after a reconnect.
+    if since_version is None:
+        _, since_version = await _changes(namespace, prefix, 0, 0)  # only changes from now on
+    while True:
+        rows, version = await _changes(namespace, prefix, since_version, limit)
+        if rows:
+            since_version = rows[-1][3] if len(rows) == limit else version
+            yield {"items": _items(rows), "version": since_version}
+        else:
+            await store.wait(version, WATCH_POLL)
+
+@tool("mem_stats")
+def mem_stats():
+    return store.stats()
 
 @app.get("/health")
 def health():
-    return {"status":"ok","tools":["mem_put","mem_get","mem_list"]}
+    return {"status":"ok","tools":["mem_put","mem_put_many","mem_get","mem_get_many","mem_list","mem_watch","mem_subscribe","mem_stats"]}
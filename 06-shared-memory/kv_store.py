@@ -0,0 +1,288 @@
+
+"""
+SQLite key-value store for the shared memory layer: one persistent writer connection and a
+pool of readers in WAL mode, a bounded read cache kept coherent with every write, batch
+put/get in a single transaction, and optional group commit of concurrent single puts.
+
+Every write stamps its rows with a store-wide, monotonically increasing ``version``, so
+readers can ask for what changed after a version they have seen (``changes``) and wait
+for the next write (``wait``) instead of re-reading a whole namespace.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import asyncio, queue, sqlite3, threading, time
+
+_ABSENT = object()  # cached "no such key"
+
+def prefix_range(prefix: str) -> Tuple[str, str]:
+    """``[lo, hi)`` bounds of the keys starting with ``prefix``, usable with the primary key index."""
+    return prefix, prefix + "\U0010ffff"
+
+def _connect(path: str, synchronous: str = "NORMAL") -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # NORMAL: no fsync per commit (the last commits may be lost on power failure, never corrupted);
+    # FULL: fsync per commit, which is what group commit amortizes.
+    conn.execute(f"PRAGMA synchronous={synchronous}")
+    return conn
+
+class KVStore:
+    """``kv(namespace, k, v, ts, version)`` with write-through caching.
+
+    Reads are served from an LRU of up to ``cache_entries`` keys (misses are cached too).
+    Writes go through the single writer connection and update the cache after commit.
+    Commits by other processes are detected with ``PRAGMA data_version`` on the writer
+    connection (its own commits do not change it), which clears the cache. Reads check at
+    most every ``external_check`` seconds and never wait for a write in progress, so an
+    external write becomes visible within about that interval. With ``group_window`` set, single puts go through a committer thread that
+    writes everything queued in one transaction: puts arriving while a commit is running
+    join the next one, and a window > 0 additionally waits that many seconds for more.
+    """
+    def __init__(self, path: str, readers: int = 4, cache_entries: int = 10000, group_window: Optional[float] = None,
+                 synchronous: str = "NORMAL", external_check: float = 0.05):
+        self.path = path
+        self.writer = _connect(path, synchronous)
+        self.writer.execute("CREATE TABLE IF NOT EXISTS kv(namespace TEXT, k TEXT, v TEXT, ts REAL, PRIMARY KEY(namespace,k))")
+        if "version" not in {r[1] for r in self.writer.execute("PRAGMA table_info(kv)")}:
+            # Databases created before versioning: number existing rows in insertion order.
+            self.writer.execute("ALTER TABLE kv ADD COLUMN version INTEGER")
+            self.writer.execute("UPDATE kv SET version = rowid")
+        self.writer.execute("CREATE INDEX IF NOT EXISTS kv_ns_version ON kv(namespace, version)")
+        self.writer.execute("CREATE INDEX IF NOT EXISTS kv_version ON kv(version)")
+        self.writer.commit()
+        self.writer.isolation_level = None  # transactions are opened explicitly (BEGIN IMMEDIATE)
+        self._wlock = threading.Lock()
+        self._data_version = self.writer.execute("PRAGMA data_version").fetchone()[0]
+        self.external_check = external_check
+        self._checked = time.monotonic()
+        self._idle: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(readers):
+            self._idle.put(_connect(path))
+        self.cache_entries = cache_entries
+        self._cache: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._clock = threading.Lock()
+        self.hits = self.misses = self.commits = 0
+        self._gen = 0  # bumped by every write; read-through fills only apply if it did not move
+        self.group_window = group_window
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+        self.last_version = 0  # latest version committed by this process
+        self._pending: "queue.Queue[Tuple[str, str, str, float, Future]]" = queue.Queue()
+        if group_window is not None:
+            threading.Thread(target=self._group_commit, name="kv-group-commit", daemon=True).start()
+
+    @contextmanager
+    def reader(self):
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    # -- cache -------------------------------------------------------------------------
+
+    def _check_external(self):
+        """Drop the cache if another process committed since the last check."""
+        if time.monotonic() - self._checked < self.external_check:
+            return
+        # Never queue behind a commit: if the writer is busy, the next read checks instead.
+        if not self._wlock.acquire(blocking=False):
+            return
+        try:
+            v = self.writer.execute("PRAGMA data_version").fetchone()[0]
+            changed, self._data_version = v != self._data_version, v
+            self._checked = time.monotonic()
+        finally:
+            self._wlock.release()
+        if changed:
+            with self._clock:
+                self._cache.clear()
+                self._gen += 1
+
+    def _cache_get(self, key: Tuple[str, str]) -> Any:
+        with self._clock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return hit
+
+    def _cache_put(self, key: Tuple[str, str], entry: Any, gen: Optional[int] = None):
+        with self._clock:
+            if gen is not None and gen != self._gen:
+                return  # a write landed while this value was read; it may already be stale
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    # -- writes ------------------------------------------------------------------------
+
+    def _commit(self, rows: List[Tuple[str, str, str, float]]) -> int:
+        """Write ``rows`` in one transaction; returns the version of the last one."""
+        with self._wlock:
+            w = self.writer
+            # IMMEDIATE takes the write lock up front, so MAX(version) cannot race another process.
+            w.execute("BEGIN IMMEDIATE")
+            try:
+                base = w.execute("SELECT COALESCE(MAX(version), 0) FROM kv").fetchone()[0]
+                w.executemany("INSERT OR REPLACE INTO kv(namespace,k,v,ts,version) VALUES(?,?,?,?,?)",
+                              [(*r, base + i) for i, r in enumerate(rows, 1)])
+                w.execute("COMMIT")
+            except BaseException:
+                w.execute("ROLLBACK")
+                raise
+            self.commits += 1
+            # Our own commit does not change data_version on this connection.
+            with self._clock:
+                self._gen += 1
+                self.last_version = base + len(rows)
+            for i, (ns, k, v, ts) in enumerate(rows, 1):
+                self._cache_put((ns, k), (v, ts, base + i))
+        self._notify()
+        return base + len(rows)
+
+    def put(self, namespace: str, key: str, value: str) -> int:
+        """Store one key; returns its new version."""
+        ts = time.time()
+        if self.group_window is None:
+            return self._commit([(namespace, key, value, ts)])
+        done: Future = Future()
+        self._pending.put((namespace, key, value, ts, done))
+        return done.result()  # re-raises a failed group commit
+
+    def put_many(self, namespace: str, items: Dict[str, str]) -> int:
+        """Store every item in one transaction; returns the last version written."""
+        ts = time.time()
+        return self._commit([(namespace, k, v, ts) for k, v in items.items()])
+
+    def _group_commit(self):
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + self.group_window
+            while True:
+                try:
+                    batch.append(self._pending.get_nowait())
+                    continue
+                except queue.Empty:
+                    pass
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=left))
+                except queue.Empty:
+                    break
+            try:
+                last = self._commit([b[:4] for b in batch])  # later puts of the same key win, as if sequential
+            except Exception as e:
+                for b in batch:
+                    b[4].set_exception(e)
+            else:
+                for i, b in enumerate(batch):
+                    b[4].set_result(last - len(batch) + 1 + i)
+
+    # -- reads -------------------------------------------------------------------------
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[str, float, int]]:
+        return self.get_many(namespace, [key]).get(key)
+
+    def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, Tuple[str, float, int]]:
+        """``{key: (value, ts, version)}`` for the keys that exist; cache misses are read in one query."""
+        self._check_external()
+        out, missing = {}, []
+        for k in dict.fromkeys(keys):
+            hit = self._cache_get((namespace, k))
+            if hit is None:
+                missing.append(k)
+            elif hit is not _ABSENT:
+                out[k] = hit
+        for i in range(0, len(missing), 500):  # stay under SQLite's bound-parameter limit
+            part = missing[i:i + 500]
+            with self._clock:
+                gen = self._gen
+            with self.reader() as conn:
+                rows = conn.execute(f"SELECT k, v, ts, version FROM kv WHERE namespace=? AND k IN ({','.join('?' * len(part))})",
+                                    (namespace, *part)).fetchall()
+            found = {r[0]: r[1:] for r in rows}
+            for k in part:
+                self._cache_put((namespace, k), found.get(k, _ABSENT), gen)
+            out.update(found)
+        return out
+
+    def list(self, namespace: str, prefix: str = "", after: Optional[str] = None,
+             limit: Optional[int] = None) -> Tuple[List[Tuple[str, str, float, int]], int]:
+        """Keys of ``namespace`` starting with ``prefix`` in key order, after key ``after``;
+        returns ``(rows, version)`` where ``version`` is the store version the rows reflect."""
+        lo, hi = prefix_range(prefix)
+        sql = "SELECT k, v, ts, version FROM kv WHERE namespace=? AND k >= ? AND k < ?"
+        args: list = [namespace, lo, hi]
+        if after is not None:
+            sql += " AND k > ?"
+            args.append(after)
+        sql += " ORDER BY k"
+        return self._snapshot(sql, args, limit)
+
+    def changes(self, namespace: str, prefix: str = "", since: int = 0,
+                limit: Optional[int] = None) -> Tuple[List[Tuple[str, str, float, int]], int]:
+        """Keys of ``namespace`` starting with ``prefix`` written after version ``since``, oldest
+        first; returns ``(rows, version)`` like ``list``. A key rewritten several times since
+        ``since`` appears once, with its latest value."""
+        lo, hi = prefix_range(prefix)
+        sql = "SELECT k, v, ts, version FROM kv WHERE namespace=? AND version > ?"
+        args: list = [namespace, since]
+        if prefix:
+            sql += " AND k >= ? AND k < ?"
+            args += [lo, hi]
+        sql += " ORDER BY version"
+        return self._snapshot(sql, args, limit)
+
+    def _snapshot(self, sql: str, args: list, limit: Optional[int]):
+        if limit is not None:
+            sql += " LIMIT ?"
+            args = [*args, limit]
+        with self.reader() as conn:
+            # One read transaction: the rows and the version come from the same WAL snapshot.
+            conn.execute("BEGIN")
+            try:
+                rows = conn.execute(sql, args).fetchall()
+                version = conn.execute("SELECT COALESCE(MAX(version), 0) FROM kv").fetchone()[0]
+            finally:
+                conn.execute("COMMIT")
+        return rows, version
+
+    # -- change notification -----------------------------------------------------------
+
+    def _notify(self):
+        with self._clock:
+            waiters, self._waiters = self._waiters, []
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    async def wait(self, seen: int, timeout: float):
+        """Return once this process has committed a version newer than ``seen``, or after
+        ``timeout`` seconds (callers re-check ``changes``, which also covers other processes)."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._clock:
+            if self.last_version > seen:
+                return
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._clock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._clock:
+            return {"cache": {"hits": self.hits, "misses": self.misses, "entries": len(self._cache),
+                              "max_entries": self.cache_entries},
+                    "commits": self.commits, "group_window": self.group_window, "readers": self._idle.qsize(),
+                    "watchers": len(self._waiters)}
@@ -1,33 +1,19 @@
 
 from common.mcp_core.server import app as base_app
-from common.mcp_core.tools import tool
-from chromadb import PersistentClient
-from sentence_transformers import SentenceTransformer
-from doc_ingest import pdf_to_text
-import os, uuid
+from common.mcp_core.tools import lazy_tool, register_executor
 
 app = base_app
-os.makedirs(".chroma_complex", exist_ok=True)
-client = PersistentClient(path=".chroma_complex")
-coll = client.get_or_create_collection("complex_docs")
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
+register_executor("ingest", kind="thread", max_workers=2)
+# Page-level PDF text extraction is CPU-bound pdfminer work: spread it over processes.
+register_executor("pdf", kind="process")
 
-@tool("ingest_pdf")
-def ingest_pdf(path: str):
-    text = pdf_to_text(path)
-    chunks = [text[i:i+800] for i in range(0, len(text), 800)]
-    ids = [str(uuid.uuid4()) for _ in chunks]
-    embs = embedder.encode(chunks).tolist()
-    coll.add(ids=ids, documents=chunks, embeddings=embs)
-    return {"ok": True, "chunks": len(chunks)}
-
-@tool("ask")
-def ask(query: str, k: int = 3):
-    q = embedder.encode([query]).tolist()
-    res = coll.query(query_embeddings=q, n_results=k, include=["documents","distances"])
-    docs = [{"text": res["documents"][0][i], "score": float(res["distances"][0][i])} for i in range(len(res["documents"][0]))]
-    return {"contexts": docs}
+lazy_tool("ingest_pdf", "docs_tools:ingest_pdf", init="docs_tools:warm", executor="ingest", max_concurrency=2, max_queue=4)
+lazy_tool("ingest_pdf_stream", "docs_tools:ingest_pdf_stream", init="docs_tools:warm", executor="ingest", max_concurrency=2, max_queue=4)
+lazy_tool("ingest_dir", "docs_tools:ingest_dir", init="docs_tools:warm", executor="ingest", max_concurrency=1, max_queue=2)
+lazy_tool("ingest_dir_stream", "docs_tools:ingest_dir_stream", init="docs_tools:warm", executor="ingest", max_concurrency=1, max_queue=2)
+lazy_tool("ask", "docs_tools:ask", init="docs_tools:warm", cache={"ttl": 600, "max_entries": 4096}, coalesce=True)
+lazy_tool("ask_batch", "docs_tools:ask_batch", init="docs_tools:warm", cache={"ttl": 600, "max_entries": 1024}, coalesce=True)
 
 @app.get("/health")
 def health():
-    return {"status":"ok","tools":["ingest_pdf","ask"]}
+    return {"status":"ok","tools":["ingest_pdf","ingest_pdf_stream","ingest_dir","ingest_dir_stream","ask","ask_batch"]}
@@ -0,0 +1,73 @@
+
+# Streaming, boundary-aware chunker: consumes (page_number, text) pairs and yields chunks with
+# page / character-offset metadata while holding at most about one page plus one chunk of text.
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+import re
+
+_PARAGRAPH = re.compile(r"\n\s*\n")
+_SENTENCE = re.compile(r"[.!?][\"')\]]*\s")
+_SPACE = re.compile(r"\s")
+
+def _cut(buf: str, size: int) -> int:
+    """Where to end a chunk of ``buf``: the last paragraph, else sentence, else word
+    boundary in the second half of the window; a hard cut at ``size`` if there is none."""
+    lo = size // 2
+    for pattern in (_PARAGRAPH, _SENTENCE, _SPACE):
+        ends = [m.end() for m in pattern.finditer(buf, lo, size + 1) if m.end() <= size]
+        if ends:
+            return ends[-1]
+    return size
+
+def chunk_pages(pages: Iterable[Tuple[int, str]], size: int = 800, overlap: int = 100) -> Iterator[Dict[str, Any]]:
+    """Yield ``{"text", "page", "page_end", "page_offset", "start", "end"}`` dicts.
+
+    ``start`` / ``end`` are character offsets into the document's extracted text (all
+    pages concatenated); ``page_offset`` is where the chunk starts within ``page``.
+    Consecutive chunks share up to ``overlap`` characters, aligned to a word start.
+    """
+    if not 0 <= overlap < size:
+        raise ValueError("overlap must be >= 0 and smaller than size")
+    buf, buf_start = "", 0
+    emitted_to = 0  # document offset up to which text is already in some chunk
+    marks: List[Tuple[int, int]] = []  # (document offset where a page starts, page number)
+
+    def page_at(offset: int) -> Tuple[int, int]:
+        page, start = marks[0][1], marks[0][0]
+        for s, p in marks:
+            if s > offset:
+                break
+            page, start = p, s
+        return page, start
+
+    def emit(cut: int):
+        text = buf[:cut]
+        lead = len(text) - len(text.lstrip())
+        text = text.strip()
+        if not text:
+            return None
+        start = buf_start + lead
+        end = start + len(text)
+        page, page_start = page_at(start)
+        return {"text": text, "page": page, "page_end": page_at(end - 1)[0], "page_offset": start - page_start,
+                "start": start, "end": end}
+
+    for page_no, page_text in pages:
+        marks.append((buf_start + len(buf), page_no))
+        buf += page_text
+        while len(buf) >= size:
+            cut = _cut(buf, size)
+            chunk = emit(cut)
+            if chunk:
+                yield chunk
+            emitted_to = buf_start + cut
+            nxt = max(cut - overlap, 1)
+            if overlap:
+                m = _SPACE.search(buf, nxt, cut)
+                nxt = m.end() if m else nxt
+            buf, buf_start = buf[nxt:], buf_start + nxt
+            while len(marks) > 1 and marks[1][0] <= buf_start:
+                marks.pop(0)
+    if marks and buf[emitted_to - buf_start:].strip():
+        chunk = emit(len(buf))
+        if chunk:
+            yield chunk
@@ -1,10 +1,83 @@
 
+from collections import deque
+from concurrent.futures import Executor
 from io import StringIO
+from itertools import islice
+from pdfminer.converter import TextConverter
 from pdfminer.high_level import extract_text_to_fp
-from typing import Tuple
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import resolve1
+from typing import Iterator, List, Optional, Tuple
+import hashlib
 
 def pdf_to_text(path: str) -> str:
     output = StringIO()
     with open(path, "rb") as f:
         extract_text_to_fp(f, output)
     return output.getvalue()
+
+def page_count(path: str) -> int:
+    with open(path, "rb") as f:
+        doc = PDFDocument(PDFParser(f))
+        try:
+            return int(resolve1(doc.catalog["Pages"])["Count"])
+        except (KeyError, TypeError, ValueError):
+            return sum(1 for _ in PDFPage.create_pages(doc))
+
+def extract_page_range(path: str, start: int, stop: int) -> List[str]:
+    """Text of pages ``start``..``stop-1`` (0-based), one string per page.
+
+    Module-level so it can run in a process pool; each call parses the file once.
+    """
+    texts = []
+    out = StringIO()
+    rsrc = PDFResourceManager()
+    device = TextConverter(rsrc, out)
+    try:
+        interp = PDFPageInterpreter(rsrc, device)
+        with open(path, "rb") as f:
+            for page in PDFPage.get_pages(f, pagenos=set(range(start, stop))):
+                interp.process_page(page)
+                texts.append(out.getvalue())
+                out.seek(0)
+                out.truncate(0)
+    finally:
+        device.close()
+    return texts
+
+def iter_pages(path: str, executor: Optional[Executor] = None, pages_per_task: int = 8,
+               window: int = 8) -> Iterator[Tuple[int, str]]:
+    """Yield ``(page_number, text)`` in page order (1-based).
+
+    With an ``executor`` (ideally a process pool) page ranges of ``pages_per_task``
+    are extracted in parallel, at most ``window`` ranges ahead of the consumer, so
+    memory stays bounded for long documents.
+    """
+    n = page_count(path)
+    ranges = iter([(s, min(s + pages_per_task, n)) for s in range(0, n, pages_per_task)])
+    if executor is None:
+        for start, stop in ranges:
+            yield from enumerate(extract_page_range(path, start, stop), start + 1)
+        return
+    pending = deque((start, executor.submit(extract_page_range, path, start, stop))
+                    for start, stop in islice(ranges, window))
+    try:
+        while pending:
+            start, fut = pending.popleft()
+            texts = fut.result()
+            for nxt in islice(ranges, 1):
+                pending.append((nxt[0], executor.submit(extract_page_range, path, *nxt)))
+            yield from enumerate(texts, start + 1)
+    finally:
+        for _, fut in pending:
+            fut.cancel()
+
+def file_sha1(path: str, block: int = 1 << 20) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(block), b""):
+            h.update(chunk)
+    return h.hexdigest()
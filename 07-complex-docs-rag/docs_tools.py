@@ -0,0 +1,169 @@
+
+# Tool implementations for app.py; chromadb / SentenceTransformer load on first call.
+from functools import lru_cache
+from chromadb import PersistentClient
+from common.mcp_core.embeddings import EmbeddingService, get_embedding_service
+from common.mcp_core.tools import invalidate_cache, current_cancel_token, get_executor, ToolCancelledError
+from common.mcp_core.util import batches
+from chunker import chunk_pages
+from doc_ingest import file_sha1, iter_pages, page_count
+from manifest import Manifest
+from typing import Dict, List
+import glob, hashlib, os
+
+# Chunk window and overlap in characters; chunks end on paragraph / sentence / word boundaries.
+CHUNK_SIZE = int(os.getenv("DOCS_CHUNK_SIZE", "800"))
+CHUNK_OVERLAP = int(os.getenv("DOCS_CHUNK_OVERLAP", "100"))
+
+@lru_cache(maxsize=None)
+def get_collection():
+    os.makedirs(".chroma_complex", exist_ok=True)
+    client = PersistentClient(path=".chroma_complex")
+    return client.get_or_create_collection("complex_docs")
+
+def get_embedder() -> EmbeddingService:
+    # Shared micro-batching encoder: concurrent `ask` calls are embedded together.
+    return get_embedding_service("all-MiniLM-L6-v2")
+
+def warm():
+    get_collection()
+    get_embedder().load()
+
+@lru_cache(maxsize=None)
+def get_manifest() -> Manifest:
+    return Manifest(os.path.join(".chroma_complex", "manifest.db"))
+
+def chunk_id(path: str, i: int) -> str:
+    # Deterministic per (file, position): re-ingesting upserts over the same ids.
+    return f"{hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]}-{i:06d}"
+
+def _pdf_pool():
+    try:
+        return get_executor("pdf")
+    except KeyError:
+        return None  # no process pool registered: extract in the calling thread
+
+def _ingest(path: str, batch: int = 64, force: bool = False):
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    manifest = get_manifest()
+    prev = manifest.get(path)
+    if prev and not force and (prev["size"], prev["mtime"]) == (st.st_size, st.st_mtime):
+        yield {"stage": "skipped", "path": path, "reason": "unchanged", "chunks": prev["chunks"]}
+        return
+    digest = file_sha1(path)
+    if prev and not force and prev["sha1"] == digest:
+        manifest.put(path, st.st_size, st.st_mtime, digest, prev["chunks"])  # touched, same content
+        yield {"stage": "skipped", "path": path, "reason": "same content", "chunks": prev["chunks"]}
+        return
+    yield {"stage": "extracting", "path": path, "pages": page_count(path)}
+    token = current_cancel_token()
+    n = 0
+    # Pages stream from the extractor into the chunker and out in embedding batches,
+    # so memory stays bounded regardless of document length.
+    for part in batches(chunk_pages(iter_pages(path, executor=_pdf_pool()), CHUNK_SIZE, CHUNK_OVERLAP), batch):
+        token.raise_if_cancelled()  # stop between batches once the caller times out
+        texts = [c.pop("text") for c in part]
+        embs = get_embedder().encode(texts).tolist()
+        get_collection().upsert(ids=[chunk_id(path, n + i) for i in range(len(part))], documents=texts,
+                                embeddings=embs, metadatas=[{"source": path, **c} for c in part])
+        n += len(part)
+        yield {"stage": "embedded", "path": path, "done": n, "page": part[-1]["page_end"]}
+    if prev and prev["chunks"] > n:
+        # The new version is shorter: drop the old tail chunks it no longer overwrites.
+        get_collection().delete(ids=[chunk_id(path, i) for i in range(n, prev["chunks"])])
+    manifest.put(path, st.st_size, st.st_mtime, digest, n)
+    invalidate_cache(prefix="ask")  # ask and ask_batch
+    yield {"stage": "done", "path": path, "chunks": n}
+
+def ingest_pdf(path: str, force: bool = False):
+    progress = {"chunks": 0}
+    for progress in _ingest(path, force=force):
+        pass
+    return {"ok": True, "chunks": progress["chunks"], "skipped": progress["stage"] == "skipped"}
+
+def ingest_pdf_stream(path: str, force: bool = False):
+    # Same as ingest_pdf but yields progress events; use via POST /rpc/stream
+    yield from _ingest(path, force=force)
+
+def _match(pattern: str):
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "**", "*.pdf")
+    return sorted(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+
+def _ingest_dir(pattern: str, force: bool = False):
+    files = _match(pattern)
+    yield {"stage": "listed", "files": len(files)}
+    for n, path in enumerate(files, 1):
+        try:
+            for progress in _ingest(path, force=force):
+                yield {**progress, "file": n, "files": len(files)}
+        except ToolCancelledError:
+            raise
+        except Exception as e:
+            yield {"stage": "error", "path": os.path.abspath(path), "error": str(e), "file": n, "files": len(files)}
+
+def ingest_dir(pattern: str, force: bool = False):
+    """Ingest every PDF under a directory (recursively) or matching a glob; unchanged files are skipped."""
+    summary = {"files": 0, "ingested": 0, "skipped": 0, "chunks": 0, "errors": []}
+    for ev in _ingest_dir(pattern, force=force):
+        if ev["stage"] == "listed":
+            summary["files"] = ev["files"]
+        elif ev["stage"] == "skipped":
+            summary["skipped"] += 1
+        elif ev["stage"] == "error":
+            summary["errors"].append({"path": ev["path"], "error": ev["error"]})
+        elif ev["stage"] == "done":
+            summary["ingested"] += 1
+            summary["chunks"] += ev["chunks"]
+    return {"ok": not summary["errors"], **summary}
+
+def ingest_dir_stream(pattern: str, force: bool = False):
+    # Per-file progress events for ingest_dir; use via POST /rpc/stream
+    yield from _ingest_dir(pattern, force=force)
+
+def _context(doc: str, dist: float, meta) -> dict:
+    meta = meta or {}
+    ctx = {"text": doc, "score": float(dist)}
+    if "source" in meta:
+        # Chunks ingested before page metadata existed carry only the source path.
+        ctx["citation"] = {k: meta[k] for k in ("source", "page", "page_end", "page_offset", "start", "end") if k in meta}
+    return ctx
+
+def ask(query: str, k: int = 3):
+    q = get_embedder().encode([query]).tolist()
+    res = get_collection().query(query_embeddings=q, n_results=k, include=["documents","distances","metadatas"])
+    metas = res["metadatas"][0] if res.get("metadatas") else [None] * len(res["documents"][0])
+    docs = [_context(d, s, m) for d, s, m in zip(res["documents"][0], res["distances"][0], metas)]
+    return {"contexts": docs}
+
+def ask_batch(queries: List[str], k: int = 3, merge: bool = False, rrf_k: int = 60):
+    """``ask`` for several queries with one embedding pass and one multi-query lookup.
+
+    With ``merge``, contexts from all queries are deduplicated by chunk and ranked by
+    reciprocal rank fusion (``sum(1 / (rrf_k + rank))``); the top ``k`` are returned,
+    each keeping its best distance as ``score``.
+    """
+    if not queries:
+        return {"contexts": []} if merge else {"results": []}
+    q = get_embedder().encode(list(queries)).tolist()
+    res = get_collection().query(query_embeddings=q, n_results=k, include=["documents","distances","metadatas"])
+    per_query = []
+    for i in range(len(queries)):
+        metas = res["metadatas"][i] if res.get("metadatas") else [None] * len(res["ids"][i])
+        per_query.append([(doc_id, _context(d, s, m)) for doc_id, d, s, m
+                          in zip(res["ids"][i], res["documents"][i], res["distances"][i], metas)])
+    if not merge:
+        return {"results": [{"query": query, "contexts": [c for _, c in hits]}
+                            for query, hits in zip(queries, per_query)]}
+    fused: Dict[str, dict] = {}
+    for qi, hits in enumerate(per_query):
+        for rank, (doc_id, ctx) in enumerate(hits, 1):
+            entry = fused.setdefault(doc_id, {**ctx, "rrf": 0.0, "queries": []})
+            entry["rrf"] += 1.0 / (rrf_k + rank)
+            entry["score"] = min(entry["score"], ctx["score"])
+            entry["queries"].append(qi)
+    best = sorted(fused.values(), key=lambda c: c["rrf"], reverse=True)[:k]
+    for c in best:
+        c["rrf"] = round(c["rrf"], 5)
+    return {"contexts": best}
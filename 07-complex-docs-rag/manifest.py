@@ -0,0 +1,30 @@
+
+# Ingestion manifest: what was ingested from each file, so unchanged files can be skipped.
+from typing import Any, Dict, Optional
+import os, sqlite3, threading, time
+
+class Manifest:
+    def __init__(self, path: str):
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS files(path TEXT PRIMARY KEY, size INTEGER, mtime REAL, "
+                          "sha1 TEXT, chunks INTEGER, ingested_at REAL)")
+        self.conn.commit()
+        self.lock = threading.Lock()
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.conn.execute("SELECT size, mtime, sha1, chunks, ingested_at FROM files WHERE path = ?",
+                                    (path,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("size", "mtime", "sha1", "chunks", "ingested_at"), row))
+
+    def put(self, path: str, size: int, mtime: float, sha1: str, chunks: int):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO files(path, size, mtime, sha1, chunks, ingested_at) "
+                              "VALUES(?, ?, ?, ?, ?, ?)", (path, size, mtime, sha1, chunks, time.time()))
+            self.conn.commit()
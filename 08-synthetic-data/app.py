@@ -1,33 +1,12 @@
 
 from common.mcp_core.server import app as base_app
-from common.mcp_core.tools import tool
-import pandas as pd
-from sdv.metadata import SingleTableMetadata
-from sdv.single_table import CTGANSynthesizer
+from common.mcp_core.tools import lazy_tool, register_executor
 
 app = base_app
+# CTGAN fits are CPU-heavy: keep them off the shared pool so cheap tools stay responsive.
+register_executor("ctgan", kind="thread", max_workers=1)
 
-@tool("generate_synthetic")
-def generate_synthetic(schema: dict, rows: int = 100):
-    # schema: {"columns": {"name":"string","age":"int","amount":"float"}}
-    cols = list(schema["columns"].keys())
-    # Create a tiny seed dataframe with inferred dtypes
-    sample = {}
-    for c, t in schema["columns"].items():
-        if t == "int":
-            sample[c] = [1, 2, 3]
-        elif t == "float":
-            sample[c] = [1.0, 2.5, 3.1]
-        else:
-            sample[c] = ["a","b","c"]
-    df = pd.DataFrame(sample)
-
-    metadata = SingleTableMetadata()
-    metadata.detect_from_dataframe(df)
-    synth = CTGANSynthesizer(metadata)
-    synth.fit(df)
-    out = synth.sample(num_rows=rows)
-    return {"rows": len(out), "preview": out.head(10).to_dict(orient="records")}
+lazy_tool("generate_synthetic", "synth:generate_synthetic", executor="ctgan", max_concurrency=1, max_queue=2)
 
 @app.get("/health")
 def health():
@@ -5,11 +5,11 @@ from research import simple_search, fetch_readable
 
 app = base_app
 
-@tool("deep_search")
+@tool("deep_search", cache={"ttl": 900, "disk": ".cache/research.db"}, coalesce=True)
 def deep_search(query: str, k: int = 5):
     return {"results": simple_search(query, num=k)}
 
-@tool("read_url")
+@tool("read_url", cache={"ttl": 3600, "disk": ".cache/research.db"}, coalesce=True)
 def read_url(url: str):
     return fetch_readable(url)
 
@@ -1 +1 @@
-from .client import MCPClient
+from .client import MCPClient, AsyncMCPClient
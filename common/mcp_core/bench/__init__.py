@@ -0,0 +1 @@
+"""Offline benchmarks for mcp_core (run with ``python -m common.mcp_core.bench.<name>``)."""
@@ -0,0 +1,57 @@
+"""
+Micro-benchmark of the per-call RPC envelope cost: decode request, build the
+request object, build and encode the response. Tool execution is excluded.
+
+    python -m common.mcp_core.bench.envelope [--n 20000] [--rows 1]
+
+Prints JSON with microseconds per call for the pre-codec pydantic path
+(``model_validate`` + ``RPCResponse.model_dump`` + ``JSONResponse``) and for each
+available codec on the fast path.
+"""
+from __future__ import annotations
+import argparse, json, time
+from typing import Any, Callable, Dict
+from fastapi.responses import JSONResponse
+from ..protocol import RPCRequest, RPCResponse
+from ..codec import JSON_CODEC, MSGPACK_CODEC, Codec
+from ..server import parse_request, _result
+
+def _payload(rows: int) -> Any:
+    row = {"found": True, "value": "x" * 64, "ts": 1700000000.123}
+    return row if rows <= 1 else {"items": [dict(row, key=f"k{i}") for i in range(rows)]}
+
+def _legacy(body: bytes, result: Any) -> bytes:
+    req = RPCRequest.model_validate(json.loads(body))
+    return JSONResponse(RPCResponse(result=result, id=req.id).model_dump()).body
+
+def _fast(codec: Codec) -> Callable[[bytes, Any], bytes]:
+    def run(body: bytes, result: Any) -> bytes:
+        req = parse_request(codec.decode(body))
+        return codec.encode(_result(result, req.id))
+    return run
+
+def _time(fn: Callable[[bytes, Any], bytes], body: bytes, result: Any, n: int) -> float:
+    for _ in range(min(n, 1000)):
+        fn(body, result)
+    t = time.perf_counter()
+    for _ in range(n):
+        fn(body, result)
+    return round((time.perf_counter() - t) / n * 1e6, 2)
+
+def run(n: int = 20000, rows: int = 1) -> Dict[str, Any]:
+    req = {"jsonrpc": "2.0", "method": "tool:mem_get", "params": {"namespace": "agents", "key": "plan"}, "id": "1"}
+    result = _payload(rows)
+    out: Dict[str, Any] = {"n": n, "rows": rows, "us_per_call": {}}
+    out["us_per_call"]["pydantic+JSONResponse"] = _time(_legacy, json.dumps(req).encode(), result, n)
+    for codec in filter(None, [JSON_CODEC, MSGPACK_CODEC]):
+        out["us_per_call"][f"fast:{codec.name}"] = _time(_fast(codec), codec.encode(req), result, n)
+    base = out["us_per_call"]["pydantic+JSONResponse"]
+    out["speedup"] = {k: round(base / v, 2) for k, v in out["us_per_call"].items()}
+    return out
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--n", type=int, default=20000)
+    ap.add_argument("--rows", type=int, default=1, help="result size: rows in the response payload")
+    a = ap.parse_args()
+    print(json.dumps(run(a.n, a.rows), indent=2))
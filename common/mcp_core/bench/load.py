@@ -0,0 +1,186 @@
+
+"""
+Load / latency benchmark for the mcp_core ``/rpc`` stack. Runs the server
+in-process (uvicorn on a loopback ephemeral port, no network access needed),
+registers synthetic stand-in tools and drives them through ``AsyncMCPClient``.
+
+    python -m common.mcp_core.bench.load [--requests 2000] [--concurrency 32]
+        [--scenarios noop,cpu,sleep,io,payload,batch,stream] [--out result.json]
+        [--compare baseline.json]
+
+The report is JSON: throughput (req/s) and p50/p95/p99 latency in ms per
+scenario, plus run metadata, so results from two versions can be diffed with
+``--compare``.
+"""
+from __future__ import annotations
+import argparse, asyncio, json, os, platform, socket, subprocess, sys, threading, time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import uvicorn
+from ..client import AsyncMCPClient
+from ..server import app
+from ..tools import tool
+from .stats import percentile
+
+# --- synthetic stand-in tools ------------------------------------------------
+
+@tool("bench_noop")
+async def bench_noop():
+    return {"ok": True}
+
+@tool("bench_cpu")
+def bench_cpu(n: int = 20000):
+    return {"sum": sum(i * i for i in range(n))}
+
+@tool("bench_sleep")
+async def bench_sleep(ms: float = 10.0):
+    await asyncio.sleep(ms / 1000)
+    return {"slept_ms": ms}
+
+@tool("bench_io")
+def bench_io(ms: float = 10.0):
+    time.sleep(ms / 1000)
+    return {"slept_ms": ms}
+
+@tool("bench_payload")
+def bench_payload(kb: int = 256):
+    row = {"id": 0, "name": "x" * 48, "value": 1.5}
+    return {"rows": [dict(row, id=i) for i in range(kb * 1024 // 80)]}
+
+@tool("bench_stream")
+def bench_stream(items: int = 100, size: int = 256):
+    for i in range(items):
+        yield {"i": i, "data": "x" * size}
+
+# --- harness -----------------------------------------------------------------
+
+class InProcessServer:
+    """uvicorn serving ``app`` on 127.0.0.1:<ephemeral> from a daemon thread."""
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{self.sock.getsockname()[1]}"
+        self.server = uvicorn.Server(uvicorn.Config(app, log_level="warning", access_log=False))
+        self.thread = threading.Thread(target=self.server.run, kwargs={"sockets": [self.sock]}, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        deadline = time.time() + 10
+        while not self.server.started:
+            if time.time() > deadline:
+                raise RuntimeError("benchmark server did not start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+async def drive(op: Callable[[], Awaitable[int]], requests: int, concurrency: int) -> Dict[str, Any]:
+    """Run ``op`` ``requests`` times with ``concurrency`` workers; ``op`` returns items handled."""
+    latencies: List[float] = []
+    errors = 0
+    items = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors, items
+        for _ in counter:
+            t = time.perf_counter()
+            try:
+                n = await op()  # not `items += await op()`: that reads items before the await
+            except Exception:
+                errors += 1
+                continue
+            items += n
+            latencies.append((time.perf_counter() - t) * 1000)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+    latencies.sort()
+    return {"requests": requests, "errors": errors, "concurrency": concurrency, "wall_s": round(wall, 3),
+            "throughput_rps": round((requests - errors) / wall, 1), "items_per_s": round(items / wall, 1),
+            "p50_ms": percentile(latencies, 50), "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99), "max_ms": round(latencies[-1], 3) if latencies else None}
+
+def _scenarios(c: AsyncMCPClient, batch_size: int, stream_items: int) -> Dict[str, Callable[[], Awaitable[int]]]:
+    async def single(name: str, **params) -> int:
+        await c.call(name, **params)
+        return 1
+
+    async def batch() -> int:
+        res = await c.batch([("bench_noop", {})] * batch_size, return_exceptions=True)
+        return sum(not isinstance(r, Exception) for r in res)
+
+    async def stream() -> int:
+        n = 0
+        async for _ in c.stream("bench_stream", items=stream_items):
+            n += 1
+        return n
+
+    return {"noop": lambda: single("bench_noop"), "cpu": lambda: single("bench_cpu"),
+            "sleep": lambda: single("bench_sleep"), "io": lambda: single("bench_io"),
+            "payload": lambda: single("bench_payload"), "batch": batch, "stream": stream}
+
+async def run_all(url: str, names: List[str], requests: int, concurrency: int, batch_size: int,
+                  stream_items: int, codec: str) -> Dict[str, Any]:
+    out = {}
+    async with AsyncMCPClient(url, max_connections=concurrency, max_keepalive=concurrency, codec=codec) as c:
+        ops = _scenarios(c, batch_size, stream_items)
+        for name in names:
+            await drive(ops[name], min(requests, 50), min(concurrency, 8))  # warm-up
+            out[name] = await drive(ops[name], requests, concurrency)
+    return out
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5, cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except Exception:
+        return None
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Relative change (%) of throughput and latency percentiles per shared scenario."""
+    delta = {}
+    for name, cur in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        delta[name] = {k: round((cur[k] - base[k]) / base[k] * 100, 1)
+                       for k in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms") if cur.get(k) and base.get(k)}
+    return delta
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--scenarios", default="noop,cpu,sleep,io,payload,batch,stream")
+    ap.add_argument("--batch-size", type=int, default=10)
+    ap.add_argument("--stream-items", type=int, default=100)
+    ap.add_argument("--codec", default="json", choices=["json", "msgpack"])
+    ap.add_argument("--out", help="write the JSON report here as well as to stdout")
+    ap.add_argument("--compare", help="baseline report to diff against")
+    a = ap.parse_args(argv)
+    names = [s.strip() for s in a.scenarios.split(",") if s.strip()]
+    with InProcessServer() as srv:
+        scenarios = asyncio.run(run_all(srv.url, names, a.requests, a.concurrency, a.batch_size,
+                                        a.stream_items, a.codec))
+    report: Dict[str, Any] = {
+        "meta": {"git_rev": _git_rev(), "python": sys.version.split()[0], "platform": platform.platform(),
+                 "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "requests": a.requests,
+                 "concurrency": a.concurrency, "batch_size": a.batch_size, "stream_items": a.stream_items,
+                 "codec": a.codec},
+        "scenarios": scenarios,
+    }
+    if a.compare:
+        with open(a.compare) as f:
+            report["delta_pct"] = compare(report, json.load(f))
+    text = json.dumps(report, indent=2)
+    if a.out:
+        with open(a.out, "w") as f:
+            f.write(text)
+    print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+"""Summary statistics shared by the benchmarks, so their reports use the same definitions."""
+from __future__ import annotations
+from typing import List, Optional
+import math
+
+def percentile(sorted_ms: List[float], p: float) -> Optional[float]:
+    """Nearest-rank ``p``-th percentile of already sorted samples, rounded to 3 decimals."""
+    if not sorted_ms:
+        return None
+    k = max(0, min(len(sorted_ms) - 1, math.ceil(p / 100 * len(sorted_ms)) - 1))
+    return round(sorted_ms[k], 3)
@@ -0,0 +1,191 @@
+
+"""
+Result caching for registered tools: an in-process LRU with TTL and a byte cap,
+plus an optional SQLite tier so entries survive restarts.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Union
+import json, os, sqlite3, threading, time
+
+MISS = object()  # returned by ToolCache.get when there is no live entry
+
+def canonical_key(params: Dict[str, Any]) -> str:
+    """Stable cache key for a params dict (key order and whitespace don't matter)."""
+    return json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+
+class _DiskTier:
+    """SQLite tier. Every ``sweep_every`` puts, expired rows are deleted and, past ``max_rows``,
+    the least recently written rows (lowest rowid: a replace assigns a new one) go first."""
+    sweep_every = 256
+
+    def __init__(self, path: str, max_rows: int = 100_000):
+        self.max_rows = max_rows
+        self._puts = 0
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS tool_cache(k TEXT PRIMARY KEY, expires REAL, v BLOB)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS tool_cache_expires ON tool_cache(expires)")
+        self.conn.commit()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[float, bytes]]:
+        with self.lock:
+            row = self.conn.execute("SELECT expires, v FROM tool_cache WHERE k=?", (key,)).fetchone()
+        return row
+
+    def put(self, key: str, expires: float, blob: bytes):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO tool_cache(k,expires,v) VALUES(?,?,?)", (key, expires, blob))
+            self._puts += 1
+            if self._puts % self.sweep_every == 0:
+                self._sweep()
+            self.conn.commit()
+
+    def _sweep(self):
+        self.conn.execute("DELETE FROM tool_cache WHERE expires <= ?", (time.time(),))
+        over = self.conn.execute("SELECT COUNT(*) FROM tool_cache").fetchone()[0] - self.max_rows
+        if over > 0:
+            self.conn.execute("DELETE FROM tool_cache WHERE rowid IN "
+                              "(SELECT rowid FROM tool_cache ORDER BY rowid LIMIT ?)", (over,))
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self.lock:
+            # A key range, not substr(): keys contain NUL, where SQLite's string functions stop.
+            cur = self.conn.execute("DELETE FROM tool_cache WHERE k >= ? AND k < ?", (prefix, prefix + "\U0010ffff"))
+            self.conn.commit()
+        return cur.rowcount
+
+_DISK: Dict[str, _DiskTier] = {}
+_DISK_LOCK = threading.Lock()
+
+def _disk(path: str, max_rows: int) -> _DiskTier:
+    with _DISK_LOCK:
+        if path not in _DISK:
+            _DISK[path] = _DiskTier(path, max_rows)
+        return _DISK[path]
+
+class ToolCache:
+    """LRU cache of serialized tool results.
+
+    ``ttl`` is in seconds (``None`` = no expiry). Entries are evicted least-recently
+    used first once either ``max_entries`` or ``max_bytes`` is exceeded. With
+    ``disk`` set, misses fall through to (and writes go to) a SQLite file shared by
+    every tool pointing at the same path; that file keeps at most ``disk_max_rows`` rows
+    (as set by the first cache opening it), and expired rows are purged as writes arrive.
+
+    ``get_memory`` never touches the disk, so async callers can probe it on the event loop
+    and run ``get_disk`` / ``put`` on a thread when ``has_disk``. ``generation`` is bumped by
+    ``clear``; a ``put`` made with an older generation (a result computed before the clear)
+    is dropped.
+    """
+    def __init__(self, ttl: Optional[float] = 300.0, max_entries: int = 1024,
+                 max_bytes: int = 64 * 1024 * 1024, disk: Optional[str] = None, disk_max_rows: int = 100_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.name = ""
+        self._disk = _disk(disk, disk_max_rows) if disk else None
+        self._data: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # orders put against clear, including the disk tier
+        self.generation = 0
+        self.hits = self.misses = self.evictions = self.disk_hits = 0
+
+    @classmethod
+    def from_option(cls, opt: Union[bool, Dict[str, Any], "ToolCache", None]) -> Optional["ToolCache"]:
+        if not opt:
+            return None
+        if isinstance(opt, ToolCache):
+            return opt
+        return cls(**opt) if isinstance(opt, dict) else cls()
+
+    def _full_key(self, key: str) -> str:
+        return f"{self.name}\x00{key}"
+
+    @property
+    def has_disk(self) -> bool:
+        return self._disk is not None
+
+    def get(self, key: str) -> Any:
+        hit = self.get_memory(key)
+        return self.get_disk(key) if hit is MISS and self._disk is not None else hit
+
+    def get_memory(self, key: str) -> Any:
+        """Probe the in-process tier only. With a disk tier, a miss is counted by ``get_disk``."""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(entry[1])
+                self._drop(key)
+            if self._disk is None:
+                self.misses += 1
+        return MISS
+
+    def get_disk(self, key: str) -> Any:
+        """Probe the SQLite tier (blocking I/O); a hit is copied into the in-process tier."""
+        row = self._disk.get(self._full_key(key))
+        if row is not None and row[0] > time.time():
+            with self._lock:
+                self.hits += 1
+                self.disk_hits += 1
+                self._store(key, row[0], row[1])
+            return json.loads(row[1])
+        with self._lock:
+            self.misses += 1
+        return MISS
+
+    def put(self, key: str, value: Any, generation: Optional[int] = None):
+        """Cache ``value``, unless ``generation`` (read before computing it) is no longer current."""
+        try:
+            blob = json.dumps(value).encode()
+        except (TypeError, ValueError):
+            return  # not JSON-serializable: never cached
+        expires = time.time() + self.ttl if self.ttl is not None else float("inf")
+        with self._write_lock:
+            if generation is not None and generation != self.generation:
+                return  # cleared while this value was computed; it may predate the change
+            with self._lock:
+                self._store(key, expires, blob)
+            if self._disk is not None:
+                self._disk.put(self._full_key(key), expires, blob)
+
+    def _store(self, key: str, expires: float, blob: bytes):
+        if len(blob) > self.max_bytes:
+            return
+        if key in self._data:
+            self._drop(key)
+        self._data[key] = (expires, blob)
+        self._bytes += len(blob)
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            self._drop(next(iter(self._data)))
+            self.evictions += 1
+
+    def _drop(self, key: str):
+        _, blob = self._data.pop(key)
+        self._bytes -= len(blob)
+
+    def clear(self) -> int:
+        with self._write_lock:
+            self.generation += 1
+            with self._lock:
+                n = len(self._data)
+                self._data.clear()
+                self._bytes = 0
+            if self._disk is not None:
+                n = max(n, self._disk.delete_prefix(self._full_key("")))
+        return n
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "disk_hits": self.disk_hits, "entries": len(self._data), "bytes": self._bytes,
+                    "ttl": self.ttl, "disk": self._disk is not None}
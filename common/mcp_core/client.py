@@ -1,23 +1,229 @@
 
 from __future__ import annotations
-import httpx, json
-from .protocol import RPCRequest
-from typing import Any, Dict
+import asyncio, httpx, json, uuid
+from concurrent.futures import ThreadPoolExecutor
+from .codec import Codec, for_media_type, get_codec
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# (tool_name, params) pairs accepted by call_many
+Call = Tuple[str, Dict[str, Any]]
+
+def _limits(max_connections: int, max_keepalive: int, keepalive_expiry: float) -> httpx.Limits:
+    return httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive,
+                        keepalive_expiry=keepalive_expiry)
+
+def _unwrap(data: Dict[str, Any]):
+    if data.get("error"):
+        raise RuntimeError(data["error"])
+    return data["result"]
+
+def _decode(r: httpx.Response):
+    codec = for_media_type(r.headers.get("content-type"))
+    if codec is None:
+        r.raise_for_status()
+        raise RuntimeError(f"Unexpected content-type {r.headers.get('content-type')!r}")
+    # Error responses still carry a JSON-RPC body; surface its error over the HTTP status.
+    try:
+        return codec.decode(r.content)
+    except Exception:
+        r.raise_for_status()
+        raise
+
+def _reply(r: httpx.Response):
+    return _unwrap(_decode(r))
+
+def _request(method: str, params: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+    req = {"jsonrpc": "2.0", "method": method, "params": params, "id": str(uuid.uuid4())}
+    if timeout is not None:
+        req["timeout"] = timeout
+    return req
+
+# Extra seconds the HTTP read waits past a server-side timeout, so the server's
+# timeout error (code -32002) arrives instead of a client-side ReadTimeout.
+_GRACE = 5.0
+
+def _stream_item(line: str):
+    """Decode one NDJSON frame; returns ``(done, result)``."""
+    msg = json.loads(line)
+    if msg.get("error"):
+        raise RuntimeError(msg["error"])
+    return bool(msg.get("done")), msg.get("result")
+
+def _batch_body(calls: Iterable[Call], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+    return [_request(f"tool:{name}", params or {}, timeout) for name, params in calls]
+
+def _batch_reply(r: httpx.Response) -> List[Dict[str, Any]]:
+    data = _decode(r)
+    if isinstance(data, dict):  # whole batch rejected
+        _unwrap(data)
+    r.raise_for_status()
+    return data
+
+def _batch_results(body: List[Dict[str, Any]], replies: List[Dict[str, Any]], return_exceptions: bool) -> List[Any]:
+    by_id = {r.get("id"): r for r in replies}
+    out = []
+    for req in body:
+        data = by_id.get(req["id"]) or {"error": {"code": -32603, "message": "No response for request"}}
+        try:
+            out.append(_unwrap(data))
+        except RuntimeError as e:
+            if not return_exceptions:
+                raise
+            out.append(e)
+    return out
 
 class MCPClient:
-    def __init__(self, base_url: str = "http://127.0.0.1:8000"):
+    """Blocking client backed by a persistent keep-alive connection pool.
+
+    The underlying ``httpx.Client`` is thread-safe, so one instance can be shared
+    by every thread in the host process. ``call_timeout`` (or ``_timeout=`` on a
+    single call) asks the server to abandon the call after that many seconds.
+    """
+
+    def _timeouts(self, timeout: Optional[float]):
+        t = self.call_timeout if timeout is None else timeout
+        return t, (self.timeout if t is None else t + _GRACE)
+    def __init__(self, base_url: str = "http://127.0.0.1:8000", timeout: float = 60.0,
+                 max_connections: int = 100, max_keepalive: int = 20, keepalive_expiry: float = 30.0,
+                 codec: str = "json", call_timeout: Optional[float] = None):
         self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.codec: Codec = get_codec(codec)
+        self.call_timeout = call_timeout  # default server-side timeout sent with each call
+        self._http = httpx.Client(base_url=self.base_url, timeout=timeout,
+                                  limits=_limits(max_connections, max_keepalive, keepalive_expiry),
+                                  headers={"content-type": self.codec.media_type, "accept": self.codec.media_type})
 
     def list_tools(self):
-        r = httpx.get(f"{self.base_url}/tools", timeout=30.0)
+        r = self._http.get("/tools", timeout=30.0)
         r.raise_for_status()
         return r.json()["tools"]
 
-    def call(self, tool_name: str, **params):
-        req = RPCRequest(method=f"tool:{tool_name}", params=params)
-        r = httpx.post(f"{self.base_url}/rpc", json=req.model_dump(), timeout=60.0)
+    def call(self, tool_name: str, _timeout: Optional[float] = None, **params):
+        t, http_t = self._timeouts(_timeout)
+        r = self._http.post("/rpc", content=self.codec.encode(_request(f"tool:{tool_name}", params, t)), timeout=http_t)
+        return _reply(r)
+
+    def call_many(self, calls: Iterable[Call], max_concurrency: Optional[int] = None,
+                  timeout: Optional[float] = None) -> List[Any]:
+        """Run independent tool calls concurrently; results come back in input order."""
+        calls = list(calls)
+        if not calls:
+            return []
+        workers = min(len(calls), max_concurrency or self.max_connections)
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            return list(ex.map(lambda c: self.call(c[0], _timeout=timeout, **(c[1] or {})), calls))
+
+    def stream(self, tool_name: str, _timeout: Optional[float] = None, **params) -> Iterator[Any]:
+        """Iterate a tool's results as the server streams them from ``/rpc/stream``."""
+        t, http_t = self._timeouts(_timeout)
+        body = self.codec.encode(_request(f"tool:{tool_name}", params, t))
+        with self._http.stream("POST", "/rpc/stream", content=body, headers={"accept": "application/x-ndjson"},
+                               timeout=http_t) as r:
+            if r.is_error:
+                r.read()
+                _reply(r)
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                done, item = _stream_item(line)
+                if done:
+                    return
+                yield item
+
+    def batch(self, calls: Iterable[Call], return_exceptions: bool = False,
+              timeout: Optional[float] = None) -> List[Any]:
+        """Send all calls as one JSON-RPC batch POST; results come back in input order.
+
+        With ``return_exceptions`` failed entries are returned as ``RuntimeError``
+        instances instead of raising.
+        """
+        t, http_t = self._timeouts(timeout)
+        body = _batch_body(calls, t)
+        if not body:
+            return []
+        r = self._http.post("/rpc", content=self.codec.encode(body), timeout=http_t)
+        return _batch_results(body, _batch_reply(r), return_exceptions)
+
+    def close(self):
+        self._http.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class AsyncMCPClient:
+    """asyncio counterpart of :class:`MCPClient` sharing one connection pool."""
+
+    _timeouts = MCPClient._timeouts
+    def __init__(self, base_url: str = "http://127.0.0.1:8000", timeout: float = 60.0,
+                 max_connections: int = 100, max_keepalive: int = 20, keepalive_expiry: float = 30.0,
+                 codec: str = "json", call_timeout: Optional[float] = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.codec: Codec = get_codec(codec)
+        self.call_timeout = call_timeout  # default server-side timeout sent with each call
+        self._http = httpx.AsyncClient(base_url=self.base_url, timeout=timeout,
+                                       limits=_limits(max_connections, max_keepalive, keepalive_expiry),
+                                       headers={"content-type": self.codec.media_type, "accept": self.codec.media_type})
+
+    async def list_tools(self):
+        r = await self._http.get("/tools", timeout=30.0)
         r.raise_for_status()
-        data = r.json()
-        if data.get("error"):
-            raise RuntimeError(data["error"])
-        return data["result"]
+        return r.json()["tools"]
+
+    async def call(self, tool_name: str, _timeout: Optional[float] = None, **params):
+        t, http_t = self._timeouts(_timeout)
+        r = await self._http.post("/rpc", content=self.codec.encode(_request(f"tool:{tool_name}", params, t)), timeout=http_t)
+        return _reply(r)
+
+    async def call_many(self, calls: Iterable[Call], max_concurrency: Optional[int] = None,
+                        return_exceptions: bool = False, timeout: Optional[float] = None) -> List[Any]:
+        """Fan out independent tool calls concurrently; results come back in input order."""
+        sem = asyncio.Semaphore(max_concurrency or self.max_connections)
+
+        async def one(name: str, params: Dict[str, Any]):
+            async with sem:
+                return await self.call(name, _timeout=timeout, **(params or {}))
+
+        return await asyncio.gather(*(one(n, p) for n, p in calls), return_exceptions=return_exceptions)
+
+    async def stream(self, tool_name: str, _timeout: Optional[float] = None, **params) -> AsyncIterator[Any]:
+        """Async iterator over a tool's streamed results; see :meth:`MCPClient.stream`."""
+        t, http_t = self._timeouts(_timeout)
+        body = self.codec.encode(_request(f"tool:{tool_name}", params, t))
+        async with self._http.stream("POST", "/rpc/stream", content=body, headers={"accept": "application/x-ndjson"},
+                                     timeout=http_t) as r:
+            if r.is_error:
+                await r.aread()
+                _reply(r)
+            async for line in r.aiter_lines():
+                if not line:
+                    continue
+                done, item = _stream_item(line)
+                if done:
+                    return
+                yield item
+
+    async def batch(self, calls: Iterable[Call], return_exceptions: bool = False,
+                    timeout: Optional[float] = None) -> List[Any]:
+        """Send all calls as one JSON-RPC batch POST; see :meth:`MCPClient.batch`."""
+        t, http_t = self._timeouts(timeout)
+        body = _batch_body(calls, t)
+        if not body:
+            return []
+        r = await self._http.post("/rpc", content=self.codec.encode(body), timeout=http_t)
+        return _batch_results(body, _batch_reply(r), return_exceptions)
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
@@ -0,0 +1,81 @@
+
+"""
+Wire codecs for the RPC envelope. JSON uses the fastest encoder installed
+(orjson > msgspec > stdlib); MessagePack is available when ``msgpack`` or
+``msgspec`` is installed and is negotiated by content-type.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, Optional
+import json
+
+JSON_TYPE = "application/json"
+MSGPACK_TYPE = "application/msgpack"
+
+class Codec:
+    def __init__(self, name: str, media_type: str, encode: Callable[[Any], bytes], decode: Callable[[bytes], Any]):
+        self.name = name
+        self.media_type = media_type
+        self.encode = encode
+        self.decode = decode
+
+    def __repr__(self):
+        return f"Codec({self.name!r}, {self.media_type!r})"
+
+def _json_codec() -> Codec:
+    try:
+        import orjson
+        opts = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        return Codec("orjson", JSON_TYPE, lambda o: orjson.dumps(o, option=opts), orjson.loads)
+    except ImportError:
+        pass
+    try:
+        import msgspec
+        return Codec("msgspec", JSON_TYPE, msgspec.json.encode, msgspec.json.decode)
+    except ImportError:
+        pass
+    return Codec("json", JSON_TYPE, lambda o: json.dumps(o, separators=(",", ":")).encode(), json.loads)
+
+def _msgpack_codec() -> Optional[Codec]:
+    try:
+        import msgpack
+        return Codec("msgpack", MSGPACK_TYPE, lambda o: msgpack.packb(o, use_bin_type=True),
+                     lambda b: msgpack.unpackb(b, raw=False))
+    except ImportError:
+        pass
+    try:
+        import msgspec
+        return Codec("msgspec-msgpack", MSGPACK_TYPE, msgspec.msgpack.encode, msgspec.msgpack.decode)
+    except ImportError:
+        return None
+
+JSON_CODEC = _json_codec()
+MSGPACK_CODEC = _msgpack_codec()
+
+_BY_TYPE: Dict[str, Codec] = {JSON_TYPE: JSON_CODEC}
+if MSGPACK_CODEC is not None:
+    _BY_TYPE[MSGPACK_TYPE] = MSGPACK_CODEC
+    _BY_TYPE["application/x-msgpack"] = MSGPACK_CODEC
+
+def for_media_type(content_type: Optional[str]) -> Optional[Codec]:
+    """Codec for a Content-Type header value; JSON when the header is absent."""
+    if not content_type:
+        return JSON_CODEC
+    return _BY_TYPE.get(content_type.split(";", 1)[0].strip().lower())
+
+def negotiate(accept: Optional[str], default: Codec) -> Codec:
+    """Pick the response codec from an Accept header, falling back to ``default``."""
+    for part in (accept or "").split(","):
+        codec = _BY_TYPE.get(part.split(";", 1)[0].strip().lower())
+        if codec is not None:
+            return codec
+    return default
+
+def get_codec(name: str) -> Codec:
+    """Look up a codec by short name (``"json"`` or ``"msgpack"``)."""
+    if name == "json":
+        return JSON_CODEC
+    if name == "msgpack":
+        if MSGPACK_CODEC is None:
+            raise RuntimeError("MessagePack codec requires 'msgpack' or 'msgspec' to be installed")
+        return MSGPACK_CODEC
+    raise KeyError(f"Unknown codec '{name}'")
@@ -0,0 +1,193 @@
+
+"""
+Shared embedding front end for the RAG apps. Concurrent ``encode`` calls from
+tool threads are gathered into micro-batches (bounded by ``max_batch`` texts and
+``max_wait_ms``) and sent to the model in one forward pass; embeddings are cached
+by model + text hash in an LRU, optionally backed by SQLite.
+
+``sentence_transformers`` is imported only when the model is first needed.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence
+import hashlib, os, queue, sqlite3, threading, time
+import numpy as np
+
+def text_key(model_name: str, text: str) -> str:
+    return hashlib.sha1(f"{model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+class _DiskVectors:
+    def __init__(self, path: str):
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings(k TEXT PRIMARY KEY, v BLOB)")
+        self.conn.commit()
+        self.lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        out = {}
+        with self.lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i+500]
+                q = f"SELECT k, v FROM embeddings WHERE k IN ({','.join('?' * len(part))})"
+                for k, v in self.conn.execute(q, part):
+                    out[k] = np.frombuffer(v, dtype=np.float32)
+        return out
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings(k, v) VALUES(?, ?)",
+                                  [(k, np.asarray(v, dtype=np.float32).tobytes()) for k, v in items.items()])
+            self.conn.commit()
+
+class EmbeddingService:
+    """Thread-safe, micro-batching, caching ``encode`` for a SentenceTransformer model.
+
+    ``encode`` returns a float32 array of shape ``(len(texts), dim)``, so existing
+    ``embedder.encode(texts).tolist()`` call sites keep working.
+    """
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", max_batch: int = 64, max_wait_ms: float = 5.0,
+                 cache_size: int = 20000, cache_path: Optional[str] = None, model: Any = None):
+        self.model_name = model_name
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.cache_size = cache_size
+        self._model = model
+        self._model_lock = threading.Lock()
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._disk = _DiskVectors(cache_path) if cache_path else None
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self.hits = self.misses = self.disk_hits = self.batches = self.batched_texts = 0
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def load(self) -> "EmbeddingService":
+        """Load the model now (for warm-up) instead of on the first encode."""
+        self.model
+        return self
+
+    # --- cache ---------------------------------------------------------------
+
+    def _cache_get(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._cache_lock:
+            for k in keys:
+                v = self._cache.get(k)
+                if v is not None:
+                    self._cache.move_to_end(k)
+                    found[k] = v
+        return found
+
+    def _cache_put(self, items: Dict[str, np.ndarray]):
+        with self._cache_lock:
+            for k, v in items.items():
+                self._cache[k] = v
+                self._cache.move_to_end(k)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # --- batching ------------------------------------------------------------
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._model_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name=f"embed-{self.model_name}", daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            size = len(pending[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                size += len(item[0])
+            texts = [t for ts, _ in pending for t in ts]
+            try:
+                vecs = np.asarray(self.model.encode(texts, batch_size=self.max_batch, convert_to_numpy=True),
+                                  dtype=np.float32)
+            except BaseException as e:
+                for _, fut in pending:
+                    fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.batched_texts += len(texts)
+            i = 0
+            for ts, fut in pending:
+                fut.set_result(vecs[i:i+len(ts)])
+                i += len(ts)
+
+    def _submit(self, texts: List[str]) -> "Future[np.ndarray]":
+        fut: "Future[np.ndarray]" = Future()
+        self._ensure_worker()
+        self._queue.put((texts, fut))
+        return fut
+
+    # --- public --------------------------------------------------------------
+
+    def encode(self, texts: Sequence[str], **_ignored) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        keys = [text_key(self.model_name, t) for t in texts]
+        found = self._cache_get(keys)
+        missing = [k for k in dict.fromkeys(keys) if k not in found]
+        on_disk = self._disk.get_many(missing) if missing and self._disk is not None else {}
+        if on_disk:
+            self._cache_put(on_disk)
+            found.update(on_disk)
+            missing = [k for k in missing if k not in on_disk]
+        with self._cache_lock:
+            self.disk_hits += len(on_disk)
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        if missing:
+            first = {}
+            for k, t in zip(keys, texts):
+                first.setdefault(k, t)
+            vecs = self._submit([first[k] for k in missing]).result()
+            fresh = {k: vecs[i] for i, k in enumerate(missing)}
+            self._cache_put(fresh)
+            if self._disk is not None:
+                self._disk.put_many(fresh)
+            found.update(fresh)
+        return np.stack([found[k] for k in keys])
+
+    def stats(self) -> Dict[str, Any]:
+        return {"model": self.model_name, "hits": self.hits, "misses": self.misses, "disk_hits": self.disk_hits,
+                "cached": len(self._cache), "batches": self.batches,
+                "avg_batch": round(self.batched_texts / self.batches, 2) if self.batches else None}
+
+_SERVICES: Dict[str, EmbeddingService] = {}
+_SERVICES_LOCK = threading.Lock()
+
+def get_embedding_service(model_name: str = "all-MiniLM-L6-v2", **opts) -> EmbeddingService:
+    """Process-wide shared service per model. ``opts`` apply on first creation only;
+    ``MCP_EMBED_CACHE`` (a SQLite path) enables the on-disk tier by default."""
+    with _SERVICES_LOCK:
+        if model_name not in _SERVICES:
+            opts.setdefault("cache_path", os.getenv("MCP_EMBED_CACHE") or None)
+            _SERVICES[model_name] = EmbeddingService(model_name, **opts)
+        return _SERVICES[model_name]
@@ -15,6 +15,9 @@ class RPCRequest(BaseModel):
     method: str
     params: Dict[str, Any] = Field(default_factory=dict)
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    # Seconds the server may spend on this call; past it the tool is cancelled and a
+    # timeout error (code -32002) is returned.
+    timeout: Optional[float] = None
 
 class RPCResponse(BaseModel):
     jsonrpc: str = "2.0"
@@ -1,28 +1,237 @@
 
 from __future__ import annotations
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from typing import Dict, Any
-from .protocol import RPCRequest, RPCResponse
-from .tools import call_tool, list_tools
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+from typing import Dict, Any, List, Union
+import asyncio, os, threading, time, uuid
+from .protocol import RPCRequest
+from .codec import Codec, JSON_CODEC, for_media_type, negotiate
+from .tools import (call_tool, stream_tool, get_tool, list_tools, tool_stats, invalidate_cache,
+                    startup_report, warmup, ToolBusyError)
 
 app = FastAPI(title="Local MCP-like Server")
 
-@app.get("/tools")
-def get_tools():
-    return {"tools": list_tools()}
+# Resolve lazy tools on a background thread once the server is accepting requests.
+WARMUP = os.getenv("MCP_WARMUP", "1") != "0"
 
-@app.post("/rpc")
-def rpc(req: RPCRequest):
+BUSY = -32001  # tool at its concurrency limit; retry later
+TIMEOUT = -32002  # request timeout expired; the tool was cancelled
+CANCELLED = -32003  # client disconnected before the call finished
+
+# How often a long-running /rpc call checks whether its client is still connected.
+DISCONNECT_POLL = float(os.getenv("MCP_DISCONNECT_POLL", "0.25"))
+
+# Max entries of one JSON-RPC batch executed at the same time.
+BATCH_CONCURRENCY = int(os.getenv("MCP_BATCH_CONCURRENCY", "8"))
+
+# The /rpc hot path works on plain dicts: requests are checked by hand and built with
+# model_construct, responses are encoded straight from dicts by the negotiated codec.
+def _result(result: Any, id=None) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "result": result, "error": None, "id": id}
+
+def _error(code: int, message: str, id=None) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "result": None, "error": {"code": code, "message": message}, "id": id}
+
+def parse_request(item: Any) -> Union[RPCRequest, Dict[str, Any]]:
+    """Build an RPCRequest from a decoded body, or return an Invalid Request error."""
+    if not isinstance(item, dict):
+        return _error(-32600, "Invalid Request: expected an object")
+    method, params, id, timeout = item.get("method"), item.get("params"), item.get("id"), item.get("timeout")
+    if not isinstance(method, str):
+        return _error(-32600, "Invalid Request: 'method' must be a string", id)
+    if params is None:
+        params = {}
+    elif not isinstance(params, dict):
+        return _error(-32600, "Invalid Request: 'params' must be an object", id)
+    if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0):
+        return _error(-32600, "Invalid Request: 'timeout' must be a positive number of seconds", id)
+    return RPCRequest.model_construct(jsonrpc="2.0", method=method, params=params,
+                                      id=str(uuid.uuid4()) if id is None else id, timeout=timeout)
+
+async def _own_timeouts(aw):
+    """Await a tool call, re-raising a TimeoutError of the tool's own (socket, HTTP client, DB)
+    as a plain error, so only the request deadline around this is reported as TIMEOUT."""
+    try:
+        return await aw
+    except asyncio.TimeoutError as e:
+        raise RuntimeError(str(e) or "Tool raised TimeoutError") from e
+
+async def dispatch(req: RPCRequest) -> Dict[str, Any]:
+    """Execute one request; failures are returned as error responses, never raised."""
     try:
         if req.method == "list_tools":
             res = {"tools": list_tools()}
+        elif req.method == "tool_stats":
+            res = {"tools": tool_stats()}
+        elif req.method == "startup_report":
+            res = startup_report()
+        elif req.method == "cache_invalidate":
+            p = req.params or {}
+            res = {"invalidated": invalidate_cache(tool=p.get("tool"), prefix=p.get("prefix"))}
         elif req.method.startswith("tool:"):
             tool_name = req.method.split("tool:",1)[1]
-            res = call_tool(tool_name, **(req.params or {}))
+            res = await asyncio.wait_for(_own_timeouts(call_tool(tool_name, **(req.params or {}))), req.timeout)
         else:
-            return JSONResponse(RPCResponse(error={"code": -32601, "message": "Method not found"}, id=req.id).model_dump())
-        return JSONResponse(RPCResponse(result=res, id=req.id).model_dump())
+            return _error(-32601, "Method not found", req.id)
+        return _result(res, req.id)
+    except asyncio.TimeoutError:
+        return _error(TIMEOUT, f"Timed out after {req.timeout}s", req.id)
+    except ToolBusyError as e:
+        return _error(BUSY, str(e), req.id)
+    except Exception as e:
+        return _error(-32000, str(e), req.id)
+
+async def dispatch_batch(items: List[Any], limit: int = BATCH_CONCURRENCY) -> List[Dict[str, Any]]:
+    sem = asyncio.Semaphore(max(1, limit))
+
+    async def one(item: Any) -> Dict[str, Any]:
+        req = parse_request(item)
+        if isinstance(req, dict):
+            return req
+        async with sem:
+            return await dispatch(req)
+
+    return await asyncio.gather(*(one(i) for i in items))
+
+def _status(resp: Dict[str, Any]) -> int:
+    err = resp.get("error")
+    if not err or err["code"] == -32601:
+        return 200
+    if err["code"] == -32600:
+        return 400
+    return {BUSY: 503, TIMEOUT: 504, CANCELLED: 499}.get(err["code"], 500)
+
+async def _unless_disconnected(request: Request, work, cancelled: Any):
+    """Await ``work``; if the client disconnects first, cancel it and return ``cancelled``."""
+    task = asyncio.ensure_future(work)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL)
+        if done:
+            return task.result()
+        if await request.is_disconnected():
+            task.cancel()
+            return cancelled
+
+def _encode(codec: Codec, payload: Any, status_code: int = 200) -> Response:
+    return Response(content=codec.encode(payload), status_code=status_code, media_type=codec.media_type)
+
+def _encodable(codec: Codec, resp: Dict[str, Any]) -> Dict[str, Any]:
+    """``resp`` if ``codec`` can encode it, else a tool error for the same id."""
+    try:
+        codec.encode(resp)
+        return resp
     except Exception as e:
-        return JSONResponse(RPCResponse(error={"code": -32000, "message": str(e)}, id=req.id).model_dump(), status_code=500)
+        return _error(-32000, f"Result could not be encoded: {e}", resp.get("id"))
+
+def _encode_rpc(codec: Codec, payload: Union[Dict[str, Any], List[Dict[str, Any]]]) -> Response:
+    """Encode a response or batch. If that fails, each entry is encoded on its own and only
+    the results that cannot be encoded become errors."""
+    try:
+        content = codec.encode(payload)
+    except Exception:
+        payload = [_encodable(codec, r) for r in payload] if isinstance(payload, list) else _encodable(codec, payload)
+        content = codec.encode(payload)
+    status = 200 if isinstance(payload, list) else _status(payload)
+    return Response(content=content, status_code=status, media_type=codec.media_type)
+
+async def _decode(request: Request):
+    """Decode the request body with the codec named by its Content-Type.
+
+    Returns ``(body, response_codec)``, or ``(error_response, None)``.
+    """
+    codec = for_media_type(request.headers.get("content-type"))
+    if codec is None:
+        return _encode(JSON_CODEC, _error(-32700, "Unsupported content-type"), 415), None
+    try:
+        body = codec.decode(await request.body())
+    except Exception:
+        return _encode(codec, _error(-32700, "Parse error"), 400), None
+    return body, negotiate(request.headers.get("accept"), codec)
+
+@app.on_event("startup")
+async def _start_warmup():
+    if WARMUP:
+        threading.Thread(target=warmup, name="mcp-warmup", daemon=True).start()
+
+@app.get("/tools")
+def get_tools():
+    return {"tools": list_tools()}
+
+@app.get("/startup")
+def get_startup():
+    return startup_report()
+
+@app.post("/rpc")
+async def rpc(request: Request):
+    body, codec = await _decode(request)
+    if codec is None:
+        return body
+    if isinstance(body, list):
+        if not body:
+            return _encode(codec, _error(-32600, "Invalid Request: empty batch"), 400)
+        gone = [_error(CANCELLED, "Client disconnected")]
+        return _encode_rpc(codec, await _unless_disconnected(request, dispatch_batch(body), gone))
+    req = parse_request(body)
+    if isinstance(req, dict):
+        resp = req
+    else:
+        resp = await _unless_disconnected(request, dispatch(req), _error(CANCELLED, "Client disconnected", req.id))
+    return _encode_rpc(codec, resp)
+
+def _frame(msg: Dict[str, Any], event: str, sse: bool) -> bytes:
+    data = JSON_CODEC.encode(msg)
+    if sse:
+        return b"event: " + event.encode() + b"\ndata: " + data + b"\n\n"
+    return data + b"\n"
+
+async def _stream_frames(req: RPCRequest, tool_name: str, sse: bool):
+    # Client disconnects are handled by StreamingResponse, which cancels this generator.
+    n = 0
+    deadline = time.monotonic() + req.timeout if req.timeout else None
+    items = stream_tool(tool_name, **(req.params or {}))
+    try:
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = await asyncio.wait_for(_own_timeouts(items.__anext__()), remaining)
+            except StopAsyncIteration:
+                break
+            n += 1
+            yield _frame({"jsonrpc": "2.0", "id": req.id, "result": item}, "result", sse)
+    except asyncio.TimeoutError:
+        yield _frame(_error(TIMEOUT, f"Timed out after {req.timeout}s", req.id), "error", sse)
+        return
+    except ToolBusyError as e:
+        yield _frame(_error(BUSY, str(e), req.id), "error", sse)
+        return
+    except Exception as e:
+        yield _frame(_error(-32000, str(e), req.id), "error", sse)
+        return
+    finally:
+        await items.aclose()
+    yield _frame({"jsonrpc": "2.0", "id": req.id, "done": True, "count": n}, "done", sse)
+
+@app.post("/rpc/stream")
+async def rpc_stream(request: Request):
+    """Streaming variant of /rpc for a single ``tool:`` call.
+
+    Emits one JSON-RPC message per yielded item, then a ``{"done": true}`` message
+    (or an ``error`` message). Framing is Server-Sent Events when the client sends
+    ``Accept: text/event-stream``, NDJSON otherwise.
+    """
+    body, codec = await _decode(request)
+    if codec is None:
+        return body
+    req = parse_request(body)
+    if isinstance(req, dict):
+        return _encode(codec, req, 400)
+    if not req.method.startswith("tool:"):
+        return _encode(codec, _error(-32601, "Method not found", req.id))
+    tool_name = req.method.split("tool:",1)[1]
+    try:
+        get_tool(tool_name)
+    except KeyError as e:
+        return _encode(codec, _error(-32000, str(e), req.id), 500)
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    return StreamingResponse(_stream_frames(req, tool_name, sse),
+                             media_type="text/event-stream" if sse else "application/x-ndjson")
@@ -1,21 +1,421 @@
 
 from __future__ import annotations
-from typing import Callable, Dict, Any
-from pydantic import BaseModel, Field
+from typing import AsyncIterator, Callable, Dict, Any, Optional, Union
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+import asyncio, contextvars, functools, importlib, inspect, multiprocessing, os, threading, time
+from .cache import ToolCache, canonical_key, MISS
 
-_TOOL_REGISTRY: Dict[str, Callable[..., Any]] = {}
+class ToolBusyError(RuntimeError):
+    """Raised when a tool is at its concurrency limit and its wait queue is full."""
 
-def tool(name: str):
-    """Decorator to register a function as a tool with a given name."""
+class ToolCancelledError(RuntimeError):
+    """Raised by :meth:`CancelToken.raise_if_cancelled` once the caller has given up."""
+
+class CancelToken:
+    """Cooperative cancellation flag for sync tools.
+
+    Sync tools cannot be interrupted from the event loop, so when a call times out
+    or its client disconnects the token is set instead. Long-running tools should
+    check it between steps, via a ``cancel_token`` parameter or
+    :func:`current_cancel_token`.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise ToolCancelledError("Tool call cancelled")
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep up to ``timeout`` seconds, waking early on cancel. Returns ``cancelled``."""
+        return self._event.wait(timeout)
+
+_CANCEL_TOKEN: contextvars.ContextVar[Optional[CancelToken]] = contextvars.ContextVar("mcp_cancel_token", default=None)
+
+def current_cancel_token() -> CancelToken:
+    """Token of the tool call running in this thread (a never-cancelled one outside calls)."""
+    return _CANCEL_TOKEN.get() or CancelToken()
+
+@dataclass
+class ToolSpec:
+    name: str
+    fn: Optional[Callable[..., Any]]  # None until a lazy tool is resolved
+    executor: str = "default"
+    max_concurrency: Optional[int] = None
+    max_queue: Optional[int] = None
+    is_async: bool = False
+    is_stream: bool = False  # generator / async generator: results are yielded incrementally
+    wants_token: bool = False  # sync tool declares a ``cancel_token`` parameter
+    cache: Optional[ToolCache] = None
+    coalesce: bool = False  # share one execution among identical in-flight calls
+    coalesced: int = 0
+    pending: int = 0  # running + waiting calls
+    _inflight: Dict[str, "_Flight"] = field(default_factory=dict, repr=False)
+    _sem: Optional[asyncio.Semaphore] = field(default=None, repr=False)
+    # lazy loading: "module:attr" resolved on first call, plus an optional init hook
+    target: Optional[str] = None
+    init: Union[str, Callable[[], Any], None] = None
+    import_ms: Optional[float] = None
+    init_ms: Optional[float] = None
+    load_error: Optional[str] = None
+    _load_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def slot(self) -> "_Slot":
+        return _Slot(self)
+
+    def bind(self, fn: Callable[..., Any]):
+        self.is_async = inspect.iscoroutinefunction(fn)
+        self.is_stream = inspect.isgeneratorfunction(fn) or inspect.isasyncgenfunction(fn)
+        try:
+            self.wants_token = "cancel_token" in inspect.signature(fn).parameters
+        except (TypeError, ValueError):
+            self.wants_token = False
+        if self.is_stream:
+            self.cache = None
+            self.coalesce = False
+        self.fn = fn
+
+class _Slot:
+    """Admission control: at most ``max_concurrency`` running and ``max_queue`` waiting.
+
+    A sync call keeps running on its executor after its caller is cancelled, so the slot
+    is held (see ``hold``) until that work finishes rather than until the caller leaves.
+    """
+    def __init__(self, spec: ToolSpec):
+        self.spec = spec
+        self._busy: Optional[Future] = None  # executor work the slot is held for
+
+    def hold(self, fut: Future):
+        self._busy = fut
+
+    async def __aenter__(self):
+        s = self.spec
+        if s.max_concurrency is None:
+            s.pending += 1
+            return self
+        if s.pending >= s.max_concurrency + (s.max_queue or 0):
+            raise ToolBusyError(f"Tool '{s.name}' is busy ({s.pending} calls in flight)")
+        if s._sem is None:
+            s._sem = asyncio.Semaphore(s.max_concurrency)
+        s.pending += 1
+        try:
+            await s._sem.acquire()
+        except BaseException:
+            s.pending -= 1
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._busy is not None and not self._busy.done():
+            loop = asyncio.get_running_loop()
+            self._busy.add_done_callback(lambda _: self._release_on(loop))
+        else:
+            self._release()
+
+    def _release_on(self, loop: asyncio.AbstractEventLoop):
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            self._release()  # loop already closed: nothing can be waiting on the semaphore
+
+    def _release(self):
+        self.spec.pending -= 1
+        if self.spec._sem is not None:
+            self.spec._sem.release()
+
+class _Flight:
+    """One in-flight execution shared by every identical concurrent call."""
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+_TOOL_REGISTRY: Dict[str, ToolSpec] = {}
+_EXECUTORS: Dict[str, Executor] = {}
+_EXECUTOR_FACTORIES: Dict[str, Callable[[], Executor]] = {
+    "default": lambda: ThreadPoolExecutor(thread_name_prefix="mcp-default"),
+}
+_EXECUTOR_LOCK = threading.Lock()
+
+def register_executor(name: str, kind: str = "thread", max_workers: Optional[int] = None,
+                      start_method: Optional[str] = None):
+    """Declare a named pool that sync tools can be pinned to via ``@tool(executor=...)``.
+
+    ``kind`` is ``"thread"`` or ``"process"``. Process pools require the tool to be a
+    picklable module-level function. The pool itself is created on first use.
+
+    Process pools start workers with ``start_method`` (default ``MCP_PROCESS_START_METHOD``,
+    else ``"spawn"``). Pools are created lazily, when the server already runs threads
+    (executors, model loaders, HTTP clients), and forking a multithreaded process can
+    deadlock the child on a lock some other thread held; ``"spawn"`` / ``"forkserver"``
+    start from a clean interpreter.
+    """
+    if kind == "thread":
+        factory = lambda: ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"mcp-{name}")
+    elif kind == "process":
+        ctx = multiprocessing.get_context(start_method or os.getenv("MCP_PROCESS_START_METHOD", "spawn"))
+        factory = lambda: ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx)
+    else:
+        raise ValueError(f"Unknown executor kind '{kind}'")
+    with _EXECUTOR_LOCK:
+        old = _EXECUTORS.pop(name, None)
+        _EXECUTOR_FACTORIES[name] = factory
+    if old is not None:
+        old.shutdown(wait=False)
+
+def get_executor(name: str) -> Executor:
+    with _EXECUTOR_LOCK:
+        if name not in _EXECUTORS:
+            if name not in _EXECUTOR_FACTORIES:
+                raise KeyError(f"Executor '{name}' not registered")
+            _EXECUTORS[name] = _EXECUTOR_FACTORIES[name]()
+        return _EXECUTORS[name]
+
+def tool(name: str, executor: str = "default", max_concurrency: Optional[int] = None,
+         max_queue: Optional[int] = 0, cache: Union[bool, Dict[str, Any], ToolCache, None] = None,
+         coalesce: bool = False):
+    """Decorator to register a function as a tool with a given name.
+
+    Coroutine functions run directly on the event loop; plain functions run on the
+    named executor. With ``max_concurrency`` set, at most that many calls run at
+    once, up to ``max_queue`` more wait, and anything beyond fails fast with
+    :class:`ToolBusyError`.
+
+    ``cache`` enables result caching keyed by the canonicalized params: ``True`` for
+    defaults, a dict of :class:`ToolCache` options (``ttl``, ``max_entries``,
+    ``max_bytes``, ``disk``) or a ready ``ToolCache``.
+
+    With ``coalesce`` (single-flight), a call whose params match one already in
+    flight awaits that call's result instead of running the tool again.
+
+    Generator and async-generator functions are streaming tools: ``stream_tool``
+    yields their items as produced, ``call_tool`` collects them into a list.
+    Streaming tools are never cached or coalesced.
+    """
     def wrap(fn: Callable[..., Any]):
-        _TOOL_REGISTRY[name] = fn
+        _register(name, fn, executor=executor, max_concurrency=max_concurrency, max_queue=max_queue,
+                  cache=cache, coalesce=coalesce)
         return fn
     return wrap
 
+def lazy_tool(name: str, target: str, init: Union[str, Callable[[], Any], None] = None, **opts):
+    """Advertise a tool by name now and import its implementation on first call.
+
+    ``target`` is ``"module:function"``; ``init`` is an optional callable (or
+    ``"module:callable"``) run once after the import, e.g. to load a model. Both
+    steps are timed for :func:`startup_report`. ``opts`` are the :func:`tool` options.
+    """
+    _register(name, None, target=target, init=init, **opts)
+
+def _register(name: str, fn: Optional[Callable[..., Any]], executor: str = "default",
+              max_concurrency: Optional[int] = None, max_queue: Optional[int] = 0,
+              cache: Union[bool, Dict[str, Any], ToolCache, None] = None, coalesce: bool = False,
+              target: Optional[str] = None, init: Union[str, Callable[[], Any], None] = None):
+    tc = ToolCache.from_option(cache)
+    if tc is not None:
+        tc.name = name
+    spec = ToolSpec(name=name, fn=None, executor=executor, max_concurrency=max_concurrency,
+                    max_queue=max_queue, cache=tc, coalesce=coalesce, target=target, init=init)
+    if fn is not None:
+        spec.bind(fn)
+    _TOOL_REGISTRY[name] = spec
+
+def _import(path: str) -> Any:
+    module, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+def resolve(spec: ToolSpec) -> ToolSpec:
+    """Import a lazy tool (and run its init hook) if that hasn't happened yet. Thread-safe."""
+    if spec.fn is not None:
+        return spec
+    with spec._load_lock:
+        if spec.fn is not None:
+            return spec
+        try:
+            t = time.perf_counter()
+            fn = _import(spec.target)
+            spec.import_ms = round((time.perf_counter() - t) * 1000, 2)
+            if spec.init is not None:
+                t = time.perf_counter()
+                (spec.init if callable(spec.init) else _import(spec.init))()
+                spec.init_ms = round((time.perf_counter() - t) * 1000, 2)
+        except Exception as e:
+            spec.load_error = f"{type(e).__name__}: {e}"
+            raise
+        spec.load_error = None
+        spec.bind(fn)
+    return spec
+
+async def _ensure_loaded(spec: ToolSpec) -> ToolSpec:
+    if spec.fn is None:
+        await asyncio.get_running_loop().run_in_executor(get_executor("default"), resolve, spec)
+    return spec
+
+def warmup(names: Optional[list] = None) -> Dict[str, Any]:
+    """Resolve lazy tools ahead of their first call (all of them by default).
+
+    Blocking; the server runs it on a background thread after startup. Failures are
+    recorded in the startup report instead of being raised.
+    """
+    for name, spec in list(_TOOL_REGISTRY.items()):
+        if names is None or name in names:
+            try:
+                resolve(spec)
+            except Exception:
+                pass
+    return startup_report()
+
+def startup_report() -> Dict[str, Any]:
+    """Per-tool import / init cost of lazily loaded tools."""
+    tools = {name: {"lazy": spec.target is not None, "loaded": spec.fn is not None,
+                    "import_ms": spec.import_ms, "init_ms": spec.init_ms, "error": spec.load_error}
+             for name, spec in _TOOL_REGISTRY.items()}
+    return {"tools": tools,
+            "total_import_ms": round(sum(t["import_ms"] or 0 for t in tools.values()), 2),
+            "total_init_ms": round(sum(t["init_ms"] or 0 for t in tools.values()), 2)}
+
 def list_tools():
     return list(_TOOL_REGISTRY.keys())
 
-def call_tool(name: str, **kwargs):
+def get_tool(name: str) -> ToolSpec:
     if name not in _TOOL_REGISTRY:
         raise KeyError(f"Tool '{name}' not found")
-    return _TOOL_REGISTRY[name](**kwargs)
+    return _TOOL_REGISTRY[name]
+
+def tool_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-tool runtime counters (in-flight calls, coalesced calls, cache hit/miss/eviction)."""
+    return {name: {"pending": spec.pending, "coalesced": spec.coalesced if spec.coalesce else None,
+                   "cache": spec.cache.stats() if spec.cache else None}
+            for name, spec in _TOOL_REGISTRY.items()}
+
+def invalidate_cache(tool: Optional[str] = None, prefix: Optional[str] = None) -> int:
+    """Drop cached results for one tool, every tool whose name starts with ``prefix``,
+    or all tools when neither is given. Returns the number of entries removed. Calls
+    already running when this is called do not cache their (possibly stale) results."""
+    n = 0
+    for name, spec in _TOOL_REGISTRY.items():
+        if spec.cache is None or (tool is not None and name != tool) or (prefix is not None and not name.startswith(prefix)):
+            continue
+        n += spec.cache.clear()
+    return n
+
+_DONE = object()
+
+async def _iterate(spec: ToolSpec, kwargs: Dict[str, Any], slot: Optional[_Slot] = None) -> AsyncIterator[Any]:
+    if inspect.isasyncgenfunction(spec.fn):
+        async for item in spec.fn(**kwargs):
+            yield item
+        return
+    # Sync generator: every step runs on the tool's executor so the loop never blocks.
+    ex = get_executor(spec.executor)
+    kwargs = dict(kwargs)
+    token, ctx = _token_context(spec, ex, kwargs)
+    gen = spec.fn(**kwargs)
+    try:
+        while True:
+            item = await _in_executor(ex, ctx, token, slot, next, gen, _DONE)
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        try:
+            gen.close()
+        except ValueError:
+            pass  # still running on the executor after a cancel; the token stops it
+
+def _token_context(spec: ToolSpec, ex: Executor, kwargs: Dict[str, Any]):
+    """Cancel token + context to run a sync tool in; no token for process pools."""
+    if isinstance(ex, ProcessPoolExecutor):
+        return None, None
+    token = CancelToken()
+    if spec.wants_token:
+        kwargs["cancel_token"] = token
+    ctx = contextvars.copy_context()
+    ctx.run(_CANCEL_TOKEN.set, token)
+    return token, ctx
+
+async def _in_executor(ex: Executor, ctx, token: Optional[CancelToken], slot: Optional[_Slot],
+                       fn: Callable[..., Any], *args):
+    work = ex.submit(ctx.run, fn, *args) if ctx is not None else ex.submit(fn, *args)
+    if slot is not None:
+        slot.hold(work)  # cancelling ``fut`` cannot stop ``work`` once it runs
+    fut = asyncio.wrap_future(work)
+    try:
+        return await fut
+    except asyncio.CancelledError:
+        if token is not None:
+            token.cancel()
+        raise
+
+async def stream_tool(name: str, **kwargs) -> AsyncIterator[Any]:
+    """Yield a tool's results incrementally; non-streaming tools yield a single item."""
+    spec = await _ensure_loaded(get_tool(name))
+    if not spec.is_stream:
+        yield await call_tool(name, **kwargs)
+        return
+    async with spec.slot() as slot:
+        async for item in _iterate(spec, kwargs, slot):
+            yield item
+
+async def _run(spec: ToolSpec, kwargs: Dict[str, Any]):
+    if spec.is_stream:
+        async with spec.slot() as slot:
+            return [item async for item in _iterate(spec, kwargs, slot)]
+    async with spec.slot() as slot:
+        if spec.is_async:
+            return await spec.fn(**kwargs)
+        ex = get_executor(spec.executor)
+        kwargs = dict(kwargs)
+        token, ctx = _token_context(spec, ex, kwargs)
+        return await _in_executor(ex, ctx, token, slot, functools.partial(spec.fn, **kwargs))
+
+async def _run_cached(spec: ToolSpec, key: str, kwargs: Dict[str, Any]):
+    cache = spec.cache
+    gen = cache.generation if cache is not None else None  # an invalidate_cache during the run drops the put
+    res = await _run(spec, kwargs)
+    if cache is not None:
+        if cache.has_disk:
+            # SQLite write (and its periodic sweep) off the event loop
+            await asyncio.get_running_loop().run_in_executor(get_executor("default"), cache.put, key, res, gen)
+        else:
+            cache.put(key, res, gen)
+    return res
+
+async def _single_flight(spec: ToolSpec, key: str, kwargs: Dict[str, Any]):
+    flight = spec._inflight.get(key)
+    if flight is None:
+        flight = _Flight(asyncio.ensure_future(_run_cached(spec, key, kwargs)))
+        spec._inflight[key] = flight
+        flight.task.add_done_callback(lambda _: spec._inflight.pop(key, None) if spec._inflight.get(key) is flight else None)
+    else:
+        spec.coalesced += 1
+    flight.waiters += 1
+    try:
+        # shield: one caller going away must not cancel the work the others await
+        return await asyncio.shield(flight.task)
+    finally:
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            flight.task.cancel()
+
+async def call_tool(name: str, **kwargs):
+    spec = await _ensure_loaded(get_tool(name))
+    if spec.cache is None and not spec.coalesce:
+        return await _run(spec, kwargs)
+    key = canonical_key(kwargs)
+    if spec.cache is not None:
+        hit = spec.cache.get_memory(key)
+        if hit is MISS and spec.cache.has_disk:
+            hit = await asyncio.get_running_loop().run_in_executor(get_executor("default"), spec.cache.get_disk, key)
+        if hit is not MISS:
+            return hit
+    if spec.coalesce:
+        return await _single_flight(spec, key, kwargs)
+    return await _run_cached(spec, key, kwargs)
@@ -0,0 +1,13 @@
+"""Small helpers shared by the apps."""
+from __future__ import annotations
+from itertools import islice
+from typing import Any, Iterable, Iterator, List
+
+def batches(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Consecutive lists of up to ``size`` items; consumes ``items`` lazily."""
+    it = iter(items)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch